@@ -0,0 +1,966 @@
+'''Modul contains benchmarks of the data structure tasks.
+
+Run all benchmarks with `python benchmark.py` or selected ones by name,
+for example `python benchmark.py lru_memory`.
+'''
+
+import os
+import sys
+import re
+import pathlib
+import shutil
+import tempfile
+import time
+import random
+import tracemalloc
+import threading
+import multiprocessing
+from collections import Counter
+
+import lru_cache
+from lru_cache import LRU_Cache
+from lru_cache import Concurrent_LRU_Cache
+from cache_policies import POLICIES
+from cache_policies import make_cache
+from shared_cache import Shared_LRU_Cache
+from find_files import FileManager
+from find_files import FileFilter
+from file_index import FileIndex
+from file_index import TrigramIndex
+from file_watcher import inotify_available
+import compression
+from compression import HuffmanCompressor
+from compression import byte_counts
+from compression import compress_stream
+from compression import decompress_stream
+from compression import compress_parallel
+from compression import decompress_parallel
+from compression import decompress_block
+from compression import read_index
+
+
+def _traced_size(filename):
+    'Returns the bytes currently allocated by code in the filename.'
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(True, filename)])
+    return sum(stat.size for stat in snapshot.statistics('filename'))
+
+
+def bench_lru_memory(n_ops=10_000_000, n_keys=16, capacity=5,
+                     n_checkpoints=10, seed=0):
+    '''Hammers the LRU cache with mixed get/set operations on a small key set
+    and reports memory allocated by the cache at regular checkpoints. Memory
+    has to stay flat as the cache holds at most `capacity` entries.
+
+    Returns:
+        list of (operations, current_bytes) tuples
+    '''
+    rng = random.Random(seed)
+    keys = [rng.randrange(n_keys) for _ in range(1 << 16)]
+    mask = len(keys) - 1
+    cache = LRU_Cache(capacity)
+    step = n_ops // n_checkpoints
+    checkpoints = []
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for op in range(n_ops):
+        key = keys[op & mask]
+        if op & 1:
+            cache.get(key)
+        else:
+            cache.set(key, op)
+
+        if op % step == 0:
+            checkpoints.append((op, _traced_size(lru_cache.__file__)))
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+
+    print('lru_memory: {:,} ops in {:.2f} s'.format(n_ops, elapsed))
+    for op, current in checkpoints:
+        print('  {:>12,} ops {:>10,} B'.format(op, current))
+    assert len(cache) <= capacity
+    return checkpoints
+
+
+def bench_lru_concurrent(n_threads=8, n_ops=200_000, n_keys=4096,
+                         capacity=1024, n_segments=16, seed=0):
+    '''Compares throughput of the lock-striped cache against a cache guarded
+    by a single global lock (one segment) under a multi-threaded mixed
+    get/set workload.
+
+    Striping showed no gain over the single segment here (about 470k ops/s
+    either way), since the GIL serializes the threads and the operations
+    hold the lock only briefly. Segments pay off when the cache operations
+    release the GIL or the interpreter runs without it.
+
+    Returns:
+        dictionary of number of segments to operations per second
+    '''
+    rng = random.Random(seed)
+    keys = [rng.randrange(n_keys) for _ in range(n_ops)]
+    results = {}
+
+    for segments in (1, n_segments):
+        cache = Concurrent_LRU_Cache(capacity, segments)
+        barrier = threading.Barrier(n_threads + 1)
+
+        def worker(offset):
+            barrier.wait()
+            for op in range(offset, n_ops, n_threads):
+                if op & 3:
+                    cache.get(keys[op])
+                else:
+                    cache.set(keys[op], op)
+
+        threads = [threading.Thread(target=worker, args=(offset,))
+                   for offset in range(n_threads)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        results[segments] = n_ops / elapsed
+        assert len(cache) <= capacity
+        print('lru_concurrent: {:>3} segment(s) {:>12,.0f} ops/s'.format(
+            segments, results[segments]))
+
+    return results
+
+
+def bench_lru_batch(n_keys=10_000, capacity=5_000, n_repeats=20):
+    '''Compares per-key overhead of get_many/set_many batch calls against
+    a Python loop over single-key get/set calls.
+
+    Returns:
+        dictionary of method to nanoseconds per key
+    '''
+    pairs = [(key, key) for key in range(n_keys)]
+    keys = [key for key, _ in pairs]
+    results = {}
+
+    def timed(name, func):
+        cache = LRU_Cache(capacity)
+        cache.set_many(pairs)
+        start = time.perf_counter()
+        for _ in range(n_repeats):
+            func(cache)
+        elapsed = time.perf_counter() - start
+        results[name] = elapsed / (n_repeats * n_keys) * 1e9
+        print('lru_batch: {:<12} {:>8.1f} ns/key'.format(name, results[name]))
+
+    def loop_set(cache):
+        for key, value in pairs:
+            cache.set(key, value)
+
+    def loop_get(cache):
+        [cache.get(key) for key in keys]
+
+    timed('set loop', loop_set)
+    timed('set_many', lambda cache: cache.set_many(pairs))
+    timed('get loop', loop_get)
+    timed('get_many', lambda cache: cache.get_many(keys))
+    return results
+
+
+def zipf_trace(n_ops, n_keys, alpha=1.0, seed=0):
+    'Returns list of keys accessed with Zipf distributed popularity.'
+    rng = random.Random(seed)
+    weights = [1 / rank ** alpha for rank in range(1, n_keys + 1)]
+    return rng.choices(range(n_keys), weights=weights, k=n_ops)
+
+
+def scan_mixed_trace(n_ops, n_keys, scan_size, scan_every, alpha=1.0, seed=0):
+    '''Returns Zipf trace interrupted every scan_every accesses by sequential
+    scan of scan_size keys never accessed again.'''
+    trace = []
+    next_scan_key = n_keys
+    for op, key in enumerate(zipf_trace(n_ops, n_keys, alpha, seed)):
+        trace.append(key)
+        if (op + 1) % scan_every == 0:
+            trace.extend(range(next_scan_key, next_scan_key + scan_size))
+            next_scan_key += scan_size
+    return trace
+
+
+def replay(cache, trace):
+    '''Replays trace of keys against the cache, setting the key on each miss.
+
+    Returns:
+        tuple of hit ratio and operations per second
+    '''
+    get, put = cache.get, cache.set
+    hits = 0
+    start = time.perf_counter()
+    for key in trace:
+        if get(key) is None:
+            put(key, key)
+        else:
+            hits += 1
+    elapsed = time.perf_counter() - start
+    return hits / len(trace), len(trace) / elapsed
+
+
+def bench_cache_policies(n_ops=500_000, n_keys=50_000, capacity=1_000,
+                         seed=0):
+    '''Reports hit ratio and throughput of each eviction policy on Zipf and
+    scan-mixed traces.
+
+    Returns:
+        dictionary of (trace name, policy) to (hit ratio, ops per second)
+    '''
+    traces = {
+        'zipf': zipf_trace(n_ops, n_keys, seed=seed),
+        'scan-mixed': scan_mixed_trace(n_ops, n_keys, scan_size=4 * capacity,
+                                       scan_every=10 * capacity, seed=seed),
+    }
+    results = {}
+    for trace_name, trace in traces.items():
+        for policy in POLICIES:
+            hit_ratio, ops = replay(make_cache(policy, capacity), trace)
+            results[trace_name, policy] = hit_ratio, ops
+            print('cache_policies: {:<10} {:<8} hit ratio {:.3f} '
+                  '{:>12,.0f} ops/s'.format(trace_name, policy, hit_ratio, ops))
+    return results
+
+
+def _replay_bytes_worker(cache, trace, results):
+    'Replays trace of int keys with bytes values and reports hits and time.'
+    cache = cache if cache is not None else LRU_Cache(results['capacity'])
+    get, put = cache.get, cache.set
+    hits = 0
+    start = time.perf_counter()
+    for key in trace:
+        key = str(key)
+        if get(key) is None:
+            put(key, key.encode())
+        else:
+            hits += 1
+    results[multiprocessing.current_process().name] = \
+        hits, time.perf_counter() - start
+
+
+def bench_shared_cache(n_workers=4, n_ops=100_000, n_keys=20_000,
+                       capacity=4_000, seed=0):
+    '''Compares one shared memory cache used by all worker processes against
+    per-process LRU caches with the same total capacity on Zipf traces.
+
+    Returns:
+        dictionary of mode to (hit ratio, aggregate ops per second)
+    '''
+    traces = [zipf_trace(n_ops, n_keys, seed=seed + worker)
+              for worker in range(n_workers)]
+    results = {}
+
+    with multiprocessing.Manager() as manager:
+        for mode in ('per-process', 'shared'):
+            shared = mode == 'shared'
+            cache = Shared_LRU_Cache(capacity, 16, 16) if shared else None
+            worker_results = manager.dict(capacity=capacity // n_workers)
+            workers = [multiprocessing.Process(
+                target=_replay_bytes_worker, name='worker-{}'.format(idx),
+                args=(cache, trace, worker_results))
+                for idx, trace in enumerate(traces)]
+
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+
+            if shared:
+                cache.close()
+                cache.unlink()
+
+            hits = sum(worker_results['worker-{}'.format(idx)][0]
+                       for idx in range(n_workers))
+            results[mode] = (hits / (n_ops * n_workers),
+                             n_ops * n_workers / elapsed)
+            print('shared_cache: {:<12} hit ratio {:.3f} {:>12,.0f} ops/s'
+                  .format(mode, *results[mode]))
+    return results
+
+
+def make_tree(root, n_files, files_per_dir=100, dirs_per_dir=10):
+    '''Creates synthetic directory tree with n_files empty files under root.
+    Directories hold files_per_dir files and up to dirs_per_dir
+    subdirectories, filled in breadth first order.'''
+    dirs = [root]
+    created = 0
+    for directory in dirs:
+        if created >= n_files:
+            break
+        for idx in range(min(files_per_dir, n_files - created)):
+            suffix = '.c' if idx % 10 == 0 else '.h'
+            open(os.path.join(directory, 'f{}{}'.format(idx, suffix)),
+                 'w').close()
+        created += files_per_dir
+        for idx in range(dirs_per_dir):
+            subdir = os.path.join(directory, 'd{}'.format(idx))
+            os.mkdir(subdir)
+            dirs.append(subdir)
+    return root
+
+
+class _StatCounter:
+    'Context manager counting calls of os.stat by Python code.'
+
+    def __enter__(self):
+        self.calls = 0
+        self._stat = os.stat
+
+        def counting_stat(*args, **kws):
+            self.calls += 1
+            return self._stat(*args, **kws)
+
+        os.stat = counting_stat
+        return self
+
+    def __exit__(self, *exc_info):
+        os.stat = self._stat
+
+
+def _pathlib_find_files(path, query):
+    '''Walker of the original FileManager._find_files based on
+    pathlib.Path.iterdir kept for comparison.'''
+    subdirs, files = [], []
+    query = re.compile(query)
+    for p in pathlib.Path(path).iterdir():
+        if p.is_dir() and not p.is_symlink():
+            subdirs.append(p)
+        if p.is_file():
+            file_path = p.as_posix()
+            if query.match(file_path):
+                files.append(file_path)
+    return subdirs, files
+
+
+def bench_find_files_scandir(n_files=1_000_000, query=r'.*\.c$'):
+    '''Walks synthetic tree of n_files sequentially with the pathlib based
+    walker and with the os.scandir based walker of FileManager, reporting
+    time and os.stat calls of each.
+
+    Returns:
+        dictionary of walker name to (seconds, stat calls, files found)
+    '''
+    file_manager = FileManager()
+    match = re.compile(query).match
+    walkers = {
+        'pathlib': lambda path: _pathlib_find_files(path, query),
+        'scandir': lambda path: file_manager._find_files(path, match),
+    }
+    results = {}
+    root = make_tree(tempfile.mkdtemp(), n_files)
+    try:
+        for name, walker in walkers.items():
+            dirs, found = [root], 0
+            with _StatCounter() as counter:
+                start = time.perf_counter()
+                while dirs:
+                    subdirs, files = walker(dirs.pop())
+                    dirs.extend(str(subdir) for subdir in subdirs)
+                    found += len(files)
+                elapsed = time.perf_counter() - start
+
+            results[name] = elapsed, counter.calls, found
+            print('find_files_scandir: {:<8} {:>8.2f} s {:>12,} stat calls '
+                  '{:>10,} files'.format(name, *results[name]))
+    finally:
+        shutil.rmtree(root)
+    return results
+
+
+class _LatencyFileManager(FileManager):
+    'FileManager simulating network file system latency per directory.'
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def _find_files(self, path, match, filters=None):
+        time.sleep(self.latency)
+        return super()._find_files(path, match, filters)
+
+
+def bench_find_files_workers(n_files=20_000, latency=0.005,
+                             workers=(1, 2, 4, 8, 16, 32)):
+    '''Runs find_files on synthetic tree with simulated per-directory
+    latency for increasing max_workers. Reports wall time and CPU time of
+    the scheduling (main) thread, which stays low as it does not busy-wait.
+
+    Returns:
+        dictionary of max_workers to (seconds, main thread CPU seconds)
+    '''
+    file_manager = _LatencyFileManager(latency)
+    results = {}
+    root = make_tree(tempfile.mkdtemp(), n_files)
+    try:
+        for max_workers in workers:
+            start, cpu_start = time.perf_counter(), time.thread_time()
+            file_manager.find_files(root, '.c', max_workers=max_workers)
+            results[max_workers] = (time.perf_counter() - start,
+                                    time.thread_time() - cpu_start)
+            print('find_files_workers: {:>3} workers {:>8.2f} s '
+                  '{:>8.3f} s main thread CPU'.format(
+                      max_workers, *results[max_workers]))
+    finally:
+        shutil.rmtree(root)
+    return results
+
+
+def bench_find_files_processes(
+        n_files=200_000, max_workers=None,
+        query=r'^(?:[^/]*/)*d[0-9]*[13579]/f[0-9]*0\.c$'):
+    '''Compares thread and process workers of find_files with CPU demanding
+    regular expression on wide and deep synthetic trees.
+
+    Returns:
+        dictionary of (tree shape, mode) to (seconds, files found)
+    '''
+    max_workers = max_workers if max_workers else os.cpu_count()
+    shapes = {
+        'wide': {'files_per_dir': 1000, 'dirs_per_dir': 50},
+        'deep': {'files_per_dir': 20, 'dirs_per_dir': 2},
+    }
+    file_manager = FileManager()
+    results = {}
+    for shape, kws in shapes.items():
+        root = make_tree(tempfile.mkdtemp(), n_files, **kws)
+        try:
+            for mode in ('threads', 'processes'):
+                start = time.perf_counter()
+                files = file_manager.find_files(
+                    root, query, regex=True, max_workers=max_workers,
+                    processes=mode == 'processes')
+                results[shape, mode] = time.perf_counter() - start, len(files)
+                print('find_files_processes: {:<5} {:<10} {:>8.2f} s '
+                      '{:>8,} files'.format(shape, mode, *results[shape, mode]))
+        finally:
+            shutil.rmtree(root)
+    return results
+
+
+def bench_file_index(n_files=200_000, query='f10.c'):
+    '''Compares find_files walking the tree against queries of persistent
+    FileIndex: initial build, incremental refresh after a change in one
+    directory, loading of the saved index, first query building the trigram
+    index and repeated query.
+
+    Returns:
+        dictionary of step to seconds
+    '''
+    file_manager = FileManager()
+    root = make_tree(tempfile.mkdtemp(), n_files)
+    index_path = os.path.join(tempfile.mkdtemp(), 'files.idx')
+    index = []
+    steps = {
+        'find_files': lambda: file_manager.find_files(root, query),
+        'build': lambda: file_manager.index_files(root, index_path),
+        'refresh': lambda: file_manager.index_files(root, index_path),
+        'load': lambda: index.append(FileIndex.load(index_path)),
+        'first query': lambda: index[0].find_files(query),
+        'query': lambda: index[0].find_files(query),
+    }
+    results = {}
+    try:
+        FileIndex.mtime_guard_ns, guard = 0, FileIndex.mtime_guard_ns
+        for step, func in steps.items():
+            if step == 'refresh':
+                open(os.path.join(root, 'd0', 'new_f10.c'), 'w').close()
+            start = time.perf_counter()
+            func()
+            results[step] = time.perf_counter() - start
+            print('file_index: {:<11} {:>8.3f} s'.format(step, results[step]))
+    finally:
+        FileIndex.mtime_guard_ns = guard
+        shutil.rmtree(root)
+        shutil.rmtree(os.path.dirname(index_path))
+    return results
+
+
+def bench_trigram_index(n_files=200_000, queries=('f1234.c', 'd3/d7/',
+                                                     r'.*d1/d2/f\d+5\.c$')):
+    '''Compares linear scan of indexed paths against the trigram index for
+    substring and regular expression queries, including the bulk build.
+
+    Returns:
+        dictionary of query to (scan seconds, trigram seconds)
+    '''
+    root = make_tree(tempfile.mkdtemp(), n_files)
+    try:
+        paths = list(FileManager().index_files(root))
+    finally:
+        shutil.rmtree(root)
+
+    start = time.perf_counter()
+    index = TrigramIndex(paths)
+    print('trigram_index: build {:>8.3f} s, {} trigrams'.format(
+        time.perf_counter() - start, len(index._postings)))
+
+    results = {}
+    for query in queries:
+        regex = query.startswith('.*')
+        if regex:
+            # Literal prefix makes the regular expression selective
+            query = root + '/' + query[2:]
+            match = re.compile(query).match
+        else:
+            match = lambda path: query in path
+
+        start = time.perf_counter()
+        expected = [path for path in paths if match(path)]
+        scan = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = index.find_files(query, regex)
+        trigram = time.perf_counter() - start
+
+        assert sorted(found) == sorted(expected)
+        results[query] = scan, trigram
+        print('trigram_index: {:<30} scan {:>7.4f} s, trigram {:>7.4f} s, '
+              '{:>6.1f}x'.format(query[-30:], scan, trigram, scan / trigram))
+    return results
+
+
+class _CountingFileManager(FileManager):
+    'FileManager counting scanned directories.'
+
+    def __init__(self):
+        self.scanned = 0
+
+    def _find_files(self, path, match, filters=None):
+        self.scanned += 1
+        return super()._find_files(path, match, filters)
+
+
+def bench_find_files_filters(n_files=100_000, query='.c'):
+    '''Compares filtering of find_files results after the walk against
+    FileFilter pruning the walk: excluded subtree (like node_modules),
+    limited depth and extension set.
+
+    Returns:
+        dictionary of case to (seconds, scanned directories)
+    '''
+    root = make_tree(tempfile.mkdtemp(), n_files)
+    root_prefix = pathlib.Path(root).as_posix() + '/'
+    cases = {
+        'exclude d0 after': (None, lambda path: 'd0' not in path[
+            len(root_prefix):].split('/')[:-1]),
+        'exclude d0 pruned': (FileFilter(exclude=['d0']), None),
+        'max_depth 2 after': (None, lambda path: path[len(root_prefix):]
+                              .count('/') <= 2),
+        'max_depth 2 pruned': (FileFilter(max_depth=2), None),
+        'extensions pruned': (FileFilter(max_depth=2, extensions={'.c'}),
+                              None),
+    }
+    results = {}
+    found = {}
+    try:
+        for case, (filters, keep) in cases.items():
+            file_manager = _CountingFileManager()
+            start = time.perf_counter()
+            files = file_manager.find_files(root, query, filters=filters)
+            if keep:
+                files = [path for path in files if keep(path)]
+            results[case] = (time.perf_counter() - start,
+                             file_manager.scanned)
+            found[case] = set(files)
+            print('find_files_filters: {:<20} {:>7.3f} s, {:>6} dirs, '
+                  '{:>6} files'.format(case, *results[case], len(files)))
+
+        # Filtering after the walk and pruning need to find the same files
+        for case in ('exclude d0', 'max_depth 2'):
+            assert found[case + ' after'] == found[case + ' pruned']
+    finally:
+        shutil.rmtree(root)
+    return results
+
+
+def _read_search_content(file_manager, root, name_query, content_pattern):
+    'Reads each found file and searches its lines one by one.'
+    pattern = re.compile(content_pattern)
+    lines = []
+    for file_path in file_manager.find_files(root, name_query):
+        with open(file_path, errors='replace') as file:
+            for line_no, line in enumerate(file, 1):
+                if pattern.search(line):
+                    lines.append((file_path, line_no, line.rstrip('\n')))
+    return lines
+
+
+def bench_search_content(n_files=2_000, n_lines=2_000, seed=0):
+    '''Compares reading found files line by line in the main thread against
+    FileManager.search_content searching memory mapped files in threads.
+
+    Returns:
+        dictionary of method to seconds
+    '''
+    rng = random.Random(seed)
+    words = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta']
+    root = make_tree(tempfile.mkdtemp(), n_files)
+    for idx, file_path in enumerate(FileManager().find_files(root, '')):
+        lines = [' '.join(rng.choices(words, k=8)) for _ in range(n_lines)]
+        lines[rng.randrange(n_lines)] = 'ERROR code {}'.format(idx)
+        with open(file_path, 'w') as file:
+            file.write('\n'.join(lines))
+
+    file_manager = FileManager()
+    methods = {
+        'read lines': lambda: _read_search_content(
+            file_manager, root, '', 'ERROR code'),
+        'search_content': lambda: list(file_manager.search_content(
+            root, '', 'ERROR code')),
+    }
+    results = {}
+    try:
+        for method, func in methods.items():
+            start = time.perf_counter()
+            lines = func()
+            results[method] = time.perf_counter() - start
+            assert len(lines) == n_files
+            print('search_content: {:<15} {:>7.3f} s'.format(
+                method, results[method]))
+    finally:
+        shutil.rmtree(root)
+    return results
+
+
+def bench_watch_files(n_files=100_000, query='.c', n_checks=5):
+    '''Compares detecting a new file by walking the tree again with
+    find_files against the polling and inotify watchers.
+
+    Returns:
+        dictionary of method to seconds per check
+    '''
+    root = make_tree(tempfile.mkdtemp(), n_files)
+    file_manager = FileManager()
+    results = {}
+    try:
+        # Freshly created tree would be listed again on each poll
+        FileIndex.mtime_guard_ns, guard = 0, FileIndex.mtime_guard_ns
+        methods = {'find_files': None, 'polling': False}
+        if inotify_available():
+            methods['inotify'] = True
+        for method, inotify in methods.items():
+            watcher = None if inotify is None else file_manager.watch_files(
+                root, query, inotify=inotify, interval=0.001)
+            files = set(file_manager.find_files(root, query))
+            start = time.perf_counter()
+            for check in range(n_checks):
+                file_path = os.path.join(
+                    root, 'd1', 'watch_{}_{}.c'.format(method, check))
+                open(file_path, 'w').close()
+                if watcher is None:
+                    new_files = set(file_manager.find_files(root, query))
+                    events = new_files - files
+                    files = new_files
+                else:
+                    events = watcher.poll(1)
+                assert len(events) == 1
+            results[method] = (time.perf_counter() - start) / n_checks
+            if watcher is not None:
+                watcher.close()
+            print('watch_files: {:<10} {:>8.4f} s per check'.format(
+                method, results[method]))
+    finally:
+        FileIndex.mtime_guard_ns = guard
+        shutil.rmtree(root)
+    return results
+
+
+def text_sample(n_chars, seed=0):
+    'Returns text of n_chars characters built from random English words.'
+    rng = random.Random(seed)
+    words = ['the', 'of', 'and', 'to', 'in', 'is', 'that', 'for', 'it',
+             'with', 'as', 'was', 'on', 'data', 'file', 'compression',
+             'Huffman', 'tree', 'code', 'bit', 'byte', '2024,', 'value.']
+    text = ' '.join(rng.choices(words, k=n_chars // 4 + 1))
+    return text[:n_chars]
+
+
+def _tree_walk_decode(compressor, bin_str):
+    '''Previous decoder of HuffmanCompressor walking the tree one character
+    of the binary string at a time and concatenating the output.'''
+    decoded_str = ''
+    bit_idx = 0
+    node = compressor._root
+    while bit_idx < len(bin_str):
+        node = node.left if bin_str[bit_idx] == '0' else node.right
+        if node:
+            char = node[1]
+            if char:
+                decoded_str += char
+            bit_idx += 1
+        else:
+            node = compressor._root
+    return decoded_str
+
+
+def bench_huffman_decode(n_chars=10_000_000, n_reference_chars=1_000_000,
+                         n_symbols=20_000):
+    '''Compares the table-driven decoder against the previous decoder walking
+    the tree per bit with string concatenation. The previous decoder is
+    measured on a prefix of the text, as it is too slow for the whole text
+    (its cost grows faster than the length). Text of English words is
+    decoded as well as tenth as long text of n_symbols characters, whose
+    tree has as many inner nodes (like CJK text). Peak memory of the first
+    decoding, which builds the table, is reported too.
+
+    Returns:
+        dictionary of text to dictionary of method to characters per second
+    '''
+    rng = random.Random(0)
+    alphabet = [chr(0x4e00 + idx) for idx in range(n_symbols)]
+    texts = {
+        'words': (text_sample(n_chars), n_reference_chars),
+        'large alphabet': (''.join(rng.choices(alphabet, k=n_chars // 10)),
+                           n_reference_chars // 10),
+    }
+    results = {}
+    for name, (text, n_prefix) in texts.items():
+        compressor = HuffmanCompressor(text)
+        bin_str = compressor.encode()
+        reference_bits = sum(len(compressor._encode_map[char])
+                             for char in text[:n_prefix])
+
+        results[name] = {}
+        start = time.perf_counter()
+        decoded = _tree_walk_decode(compressor, bin_str[:reference_bits])
+        results[name]['tree walk'] = n_prefix / (time.perf_counter() - start)
+        assert decoded == text[:n_prefix]
+
+        # First decoding builds the table
+        for method in ('table first', 'table'):
+            start = time.perf_counter()
+            decoded = compressor.decode(bin_str)
+            results[name][method] = len(text) / (time.perf_counter() - start)
+            assert decoded == text
+        del decoded
+
+        # Tracing slows down allocations, memory is measured in extra run
+        compressor = HuffmanCompressor(text)
+        tracemalloc.start()
+        compressor.decode(bin_str)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        for method, chars_per_second in results[name].items():
+            print('huffman_decode: {:<15} {:<12} {:>14,.0f} chars/s'.format(
+                name, method, chars_per_second))
+        print('huffman_decode: {:<15} speedup {:.0f}x, peak {:>13,} B'.format(
+            name, results[name]['table'] / results[name]['tree walk'], peak))
+    return results
+
+
+def bench_huffman_encode(n_chars=10_000_000):
+    '''Compares encode returning string of '0' and '1' characters against
+    encode_bytes returning packed container: peak memory allocated while
+    encoding, size of the output and throughput.
+
+    Returns:
+        dictionary of method to (seconds, peak bytes, output bytes)
+    '''
+    text = text_sample(n_chars)
+    compressor = HuffmanCompressor(text)
+    results = {}
+    for method in ('encode', 'encode_bytes'):
+        start = time.perf_counter()
+        encoded = getattr(compressor, method)()
+        elapsed = time.perf_counter() - start
+        del encoded
+
+        # Tracing slows down allocations, memory is measured in second run
+        tracemalloc.start()
+        encoded = getattr(compressor, method)()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[method] = elapsed, peak, sys.getsizeof(encoded)
+        print('huffman_encode: {:<12} {:>12,.0f} chars/s, peak {:>13,} B, '
+              'output {:>13,} B'.format(method, n_chars / elapsed, peak,
+                                        results[method][2]))
+        del encoded
+    print('huffman_encode: input {:>13,} B'.format(sys.getsizeof(text)))
+    return results
+
+
+def bench_huffman_bytes(n_bytes=8 << 20):
+    '''Compares compressing bytes mapped to latin-1 string against bytes
+    passed directly with the 256 symbol alphabet: histogram of the symbols
+    (Counter of characters against byte_counts) and encoding to container.
+
+    Returns:
+        dictionary of input to (histogram seconds, encode_bytes seconds)
+    '''
+    data = text_sample(n_bytes).encode()[:n_bytes]
+    inputs = {'latin-1 str': (data.decode('latin-1'), Counter),
+              'bytes': (data, byte_counts)}
+    results = {}
+    for name, (string, count) in inputs.items():
+        start = time.perf_counter()
+        count(string)
+        histogram = time.perf_counter() - start
+
+        compressor = HuffmanCompressor(string)
+        start = time.perf_counter()
+        container = compressor.encode_bytes()
+        results[name] = histogram, time.perf_counter() - start
+        assert compressor.decode(container) == string
+        print('huffman_bytes: {:<12} histogram {:>6.3f} s, encode_bytes '
+              '{:>6.3f} s'.format(name, *results[name]))
+    print('huffman_bytes: numpy {}'.format(
+        'used' if compression.numpy is not None else 'not installed'))
+    return results
+
+
+def _write_log(path, n_bytes, seed=0):
+    'Writes synthetic log file of about n_bytes bytes.'
+    rng = random.Random(seed)
+    levels = ['INFO', 'INFO', 'INFO', 'DEBUG', 'WARNING', 'ERROR']
+    with open(path, 'w') as log:
+        written = 0
+        while written < n_bytes:
+            line = '2024-05-{:02d} {:02d}:{:02d}:{:02d} {} request {} in {} ms\n'\
+                .format(rng.randint(1, 28), rng.randrange(24),
+                        rng.randrange(60), rng.randrange(60),
+                        rng.choice(levels), rng.randrange(10 ** 6),
+                        rng.randrange(1000))
+            written += log.write(line)
+
+
+def bench_huffman_stream(sizes=(4 << 20, 16 << 20), block_size=1 << 20):
+    '''Compresses and decompresses log files of growing sizes with the
+    streaming API, reports throughput and peak memory allocated, which is
+    bounded by the block size and does not grow with the file size.
+
+    Returns:
+        dictionary of size to (compress MB/s, decompress MB/s, ratio,
+        peak bytes)
+    '''
+    temp_dir = tempfile.mkdtemp()
+    paths = [os.path.join(temp_dir, name) for name in ('log', 'huf', 'out')]
+    results = {}
+    try:
+        for size in sizes:
+            _write_log(paths[0], size)
+            size = os.path.getsize(paths[0])
+
+            def compress():
+                with open(paths[0], 'rb') as source, \
+                        open(paths[1], 'wb') as destination:
+                    compress_stream(source, destination, block_size)
+
+            def decompress():
+                with open(paths[1], 'rb') as source, \
+                        open(paths[2], 'wb') as destination:
+                    decompress_stream(source, destination)
+
+            times = []
+            for func in (compress, decompress):
+                start = time.perf_counter()
+                func()
+                times.append(time.perf_counter() - start)
+
+            tracemalloc.start()
+            compress()
+            decompress()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            with open(paths[0], 'rb') as log, open(paths[2], 'rb') as out:
+                assert log.read() == out.read()
+            ratio = os.path.getsize(paths[1]) / size
+            results[size] = (size / times[0] / 1e6, size / times[1] / 1e6,
+                             ratio, peak)
+            print('huffman_stream: {:>12,} B compress {:>6.1f} MB/s, '
+                  'decompress {:>6.1f} MB/s, ratio {:.3f}, peak {:>12,} B'
+                  .format(size, *results[size]))
+    finally:
+        shutil.rmtree(temp_dir)
+    return results
+
+
+def bench_huffman_parallel(size=32 << 20, block_size=1 << 20,
+                           max_workers=None):
+    '''Compares sequential streaming compression and decompression against
+    worker processes handling the blocks in parallel, and reports time of
+    random access to a single block through the block index.
+
+    Returns:
+        dictionary of method to MB/s of the uncompressed data
+    '''
+    temp_dir = tempfile.mkdtemp()
+    log_path = os.path.join(temp_dir, 'log')
+    huf_path = os.path.join(temp_dir, 'huf')
+    out_path = os.path.join(temp_dir, 'out')
+    _write_log(log_path, size)
+    size = os.path.getsize(log_path)
+
+    def run(func, source_path, destination_path, **kws):
+        with open(source_path, 'rb') as source, \
+                open(destination_path, 'wb') as destination:
+            func(source, destination, **kws)
+
+    methods = {
+        'compress_stream': lambda: run(compress_stream, log_path, huf_path,
+                                       block_size=block_size),
+        'compress_parallel': lambda: run(compress_parallel, log_path,
+                                         huf_path, block_size=block_size,
+                                         max_workers=max_workers),
+        'decompress_stream': lambda: run(decompress_stream, huf_path,
+                                         out_path),
+        'decompress_parallel': lambda: run(decompress_parallel, huf_path,
+                                           out_path, max_workers=max_workers),
+    }
+    results = {}
+    try:
+        for method, func in methods.items():
+            start = time.perf_counter()
+            func()
+            results[method] = size / (time.perf_counter() - start) / 1e6
+            print('huffman_parallel: {:<20} {:>7.1f} MB/s'.format(
+                method, results[method]))
+
+        with open(huf_path, 'rb') as archive, open(log_path, 'rb') as log:
+            index = read_index(archive)
+            block_idx = len(index) // 2
+            start = time.perf_counter()
+            block = decompress_block(archive, block_idx, index)
+            elapsed = time.perf_counter() - start
+            log.seek(block_idx * block_size)
+            assert block == log.read(block_size)
+        print('huffman_parallel: block {} of {} decoded in {:.3f} s'.format(
+            block_idx, len(index), elapsed))
+    finally:
+        shutil.rmtree(temp_dir)
+    return results
+
+
+BENCHMARKS = {
+    'lru_memory': bench_lru_memory,
+    'lru_concurrent': bench_lru_concurrent,
+    'lru_batch': bench_lru_batch,
+    'cache_policies': bench_cache_policies,
+    'shared_cache': bench_shared_cache,
+    'find_files_scandir': bench_find_files_scandir,
+    'find_files_workers': bench_find_files_workers,
+    'find_files_processes': bench_find_files_processes,
+    'find_files_filters': bench_find_files_filters,
+    'search_content': bench_search_content,
+    'watch_files': bench_watch_files,
+    'huffman_decode': bench_huffman_decode,
+    'huffman_encode': bench_huffman_encode,
+    'huffman_bytes': bench_huffman_bytes,
+    'huffman_stream': bench_huffman_stream,
+    'huffman_parallel': bench_huffman_parallel,
+    'file_index': bench_file_index,
+    'trigram_index': bench_trigram_index,
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
@@ -0,0 +1,373 @@
+'''Modul contains scan resistant eviction policies sharing the Cache interface
+with LRU_Cache: 2Q, ARC and W-TinyLFU.'''
+
+from array import array
+from collections import OrderedDict
+
+from lru_cache import Cache
+from lru_cache import LRU_Cache
+
+# Sentinel distinguishing nonexistent keys from keys holding None
+_MISSING = object()
+
+
+class TwoQ_Cache(Cache):
+    '''Full 2Q cache. New keys enter FIFO queue a1_in and only keys accessed
+    again after they were evicted from it (remembered in ghost queue a1_out)
+    are promoted to the LRU queue a_m, so one-time scans never flush a_m.
+
+    Attributes:
+        capacity: Positive integer, capacity of the cache memory
+        in_ratio: Float, share of capacity reserved for a1_in, 0.25 default
+        out_ratio: Float, number of ghost keys in a1_out relative to
+            capacity, 0.5 by default
+        evictions: Integer, number of items removed from the cache
+    '''
+
+    def __init__(self, capacity=5, in_ratio=0.25, out_ratio=0.5):
+        super().__init__(capacity)
+        assert 0 < in_ratio < 1, 'In ratio needs to be between 0 and 1.'
+        assert out_ratio > 0, 'Out ratio needs to be positive.'
+
+        self.in_capacity = max(1, int(capacity * in_ratio))
+        self.out_capacity = max(1, int(capacity * out_ratio))
+        self._a1_in = OrderedDict()
+        self._a1_out = OrderedDict()
+        self._a_m = OrderedDict()
+
+    def __len__(self):
+        return len(self._a1_in) + len(self._a_m)
+
+    def __contains__(self, key):
+        return (key in self._a_m) or (key in self._a1_in)
+
+    def get(self, key):
+        '''Retrieve item from provided key. Return None if nonexistent.'''
+        if key in self._a_m:
+            self._a_m.move_to_end(key)
+            return self._a_m[key]
+        return self._a1_in.get(key)
+
+    def set(self, key, value):
+        '''Set the value of the key. Keys remembered in ghost queue are
+        promoted to the LRU queue, the others enter the FIFO queue.
+        '''
+        if key in self._a_m:
+            self._a_m[key] = value
+            self._a_m.move_to_end(key)
+        elif key in self._a1_in:
+            self._a1_in[key] = value
+        elif key in self._a1_out:
+            del self._a1_out[key]
+            self._reclaim()
+            self._a_m[key] = value
+        else:
+            self._reclaim()
+            self._a1_in[key] = value
+
+    def clear(self):
+        '''Removes all items and ghost keys from the cache.'''
+        self._a1_in.clear()
+        self._a1_out.clear()
+        self._a_m.clear()
+
+    def _reclaim(self):
+        '''Frees one slot if the cache is at capacity.'''
+        if len(self) < self.capacity:
+            return
+
+        if (len(self._a1_in) > self.in_capacity) or not self._a_m:
+            key, _ = self._a1_in.popitem(last=False)
+            self._a1_out[key] = None
+            if len(self._a1_out) > self.out_capacity:
+                self._a1_out.popitem(last=False)
+        else:
+            self._a_m.popitem(last=False)
+        self.evictions += 1
+
+
+class ARC_Cache(Cache):
+    '''Adaptive replacement cache. Recently (t1) and frequently (t2) used
+    items are kept in two LRU lists, while ghost lists b1 and b2 remember keys
+    evicted from them. Hits in ghost lists adapt the target size p of t1.
+
+    Attributes:
+        capacity: Positive integer, capacity of the cache memory
+        p: Float, target size of the recency list t1
+        evictions: Integer, number of items removed from the cache
+    '''
+
+    def __init__(self, capacity=5):
+        super().__init__(capacity)
+
+        self.p = 0
+        self._t1 = OrderedDict()
+        self._t2 = OrderedDict()
+        self._b1 = OrderedDict()
+        self._b2 = OrderedDict()
+
+    def __len__(self):
+        return len(self._t1) + len(self._t2)
+
+    def __contains__(self, key):
+        return (key in self._t1) or (key in self._t2)
+
+    def get(self, key):
+        '''Retrieve item from provided key and move it to the frequency list.
+        Return None if nonexistent.
+        '''
+        if key in self._t2:
+            self._t2.move_to_end(key)
+            return self._t2[key]
+        if key in self._t1:
+            value = self._t2[key] = self._t1.pop(key)
+            return value
+        return None
+
+    def set(self, key, value):
+        '''Set the value of the key. Hits in ghost lists adapt the target size
+        of the recency list before the key is inserted to the frequency list.
+        '''
+        capacity = self.capacity
+        t1, t2, b1, b2 = self._t1, self._t2, self._b1, self._b2
+
+        if key in t1:
+            del t1[key]
+            t2[key] = value
+        elif key in t2:
+            t2[key] = value
+            t2.move_to_end(key)
+        elif key in b1:
+            self.p = min(capacity, self.p + max(len(b2) / len(b1), 1))
+            self._replace(key)
+            del b1[key]
+            t2[key] = value
+        elif key in b2:
+            self.p = max(0, self.p - max(len(b1) / len(b2), 1))
+            self._replace(key)
+            del b2[key]
+            t2[key] = value
+        else:
+            l1_size = len(t1) + len(b1)
+            if l1_size >= capacity:
+                if len(t1) < capacity:
+                    b1.popitem(last=False)
+                    self._replace(key)
+                else:
+                    t1.popitem(last=False)
+                    self.evictions += 1
+            elif l1_size + len(t2) + len(b2) >= capacity:
+                if l1_size + len(t2) + len(b2) >= 2 * capacity:
+                    b2.popitem(last=False)
+                self._replace(key)
+            t1[key] = value
+
+    def clear(self):
+        '''Removes all items and ghost keys from the cache.'''
+        for memory in (self._t1, self._t2, self._b1, self._b2):
+            memory.clear()
+        self.p = 0
+
+    def _replace(self, key):
+        '''Moves the least recently used item of t1 or t2 to its ghost list if
+        the cache is at capacity.
+        '''
+        if len(self) < self.capacity:
+            return
+
+        t1_size = len(self._t1)
+        if t1_size and ((t1_size > self.p)
+                        or ((key in self._b2) and (t1_size == self.p))):
+            old_key, _ = self._t1.popitem(last=False)
+            self._b1[old_key] = None
+        else:
+            old_key, _ = self._t2.popitem(last=False)
+            self._b2[old_key] = None
+        self.evictions += 1
+
+
+class CountMinSketch:
+    '''Count-min sketch estimating access frequency of keys with four rows of
+    saturating 4-bit counters stored in one flat array. Row indexes are
+    derived from a single multiplicative hash (double hashing). All counters
+    are halved after sample_size increments, so the estimate reflects recent
+    popularity.
+
+    Attributes:
+        width: Integer, number of counters in each row (power of two)
+        sample_size: Integer, number of increments between halving
+    '''
+
+    _MASK = (1 << 64) - 1
+    _SEED = 0x9E3779B97F4A7C15
+    _MAX_COUNT = 15
+
+    def __init__(self, capacity):
+        assert isinstance(capacity, int) and (capacity > 0), \
+            'Capacity needs to be positive int.'
+
+        self.width = 1 << max(4, (capacity - 1).bit_length())
+        self.sample_size = 10 * self.width
+        self._table = array('B', bytes(4 * self.width))
+        self._samples = 0
+
+    def _indexes(self, key):
+        h = (hash(key) * self._SEED) & self._MASK
+        h1, h2 = h >> 32, (h >> 8) | 1
+        width = self.width
+        mask = width - 1
+        return (h1 & mask,
+                width + ((h1 + h2) & mask),
+                2 * width + ((h1 + 2 * h2) & mask),
+                3 * width + ((h1 + 3 * h2) & mask))
+
+    def estimate(self, key):
+        '''Returns estimated access frequency of the key.'''
+        table = self._table
+        idx1, idx2, idx3, idx4 = self._indexes(key)
+        return min(table[idx1], table[idx2], table[idx3], table[idx4])
+
+    def increment(self, key):
+        '''Increments access frequency of the key.'''
+        table = self._table
+        for idx in self._indexes(key):
+            if table[idx] < self._MAX_COUNT:
+                table[idx] += 1
+
+        self._samples += 1
+        if self._samples >= self.sample_size:
+            self._age()
+
+    def _age(self):
+        table = self._table
+        table[:] = array('B', bytes(count >> 1 for count in table))
+        self._samples //= 2
+
+
+class TinyLFU_Cache(Cache):
+    '''Window TinyLFU cache. New keys enter a small LRU window. Keys evicted
+    from the window are admitted to the segmented LRU main cache only if
+    they are estimated to be accessed more frequently than the main cache
+    victim, so one-time scans are filtered out.
+
+    Attributes:
+        capacity: Positive integer, capacity of the cache memory
+        window_ratio: Float, share of capacity reserved for window, 0.01 by
+            default
+        protected_ratio: Float, share of main cache reserved for protected
+            segment, 0.8 by default
+        sketch: CountMinSketch estimating access frequency of keys
+        evictions: Integer, number of items removed from the cache
+    '''
+
+    def __init__(self, capacity=5, window_ratio=0.01, protected_ratio=0.8):
+        super().__init__(capacity)
+        assert 0 < window_ratio < 1, \
+            'Window ratio needs to be between 0 and 1.'
+        assert 0 < protected_ratio < 1, \
+            'Protected ratio needs to be between 0 and 1.'
+
+        self.window_capacity = max(1, int(capacity * window_ratio))
+        self.main_capacity = capacity - self.window_capacity
+        self.protected_capacity = int(self.main_capacity * protected_ratio)
+        self.sketch = CountMinSketch(capacity)
+        self._window = OrderedDict()
+        self._probation = OrderedDict()
+        self._protected = OrderedDict()
+
+    def __len__(self):
+        return len(self._window) + len(self._probation) + len(self._protected)
+
+    def __contains__(self, key):
+        return ((key in self._window) or (key in self._probation)
+                or (key in self._protected))
+
+    def get(self, key):
+        '''Retrieve item from provided key and record its access. Return None
+        if nonexistent.
+        '''
+        self.sketch.increment(key)
+        value = self._touch(key)
+        return None if value is _MISSING else value
+
+    def set(self, key, value):
+        '''Set the value of the key and record its access. New keys enter the
+        window and the window victim competes for admission to main cache.
+        '''
+        self.sketch.increment(key)
+        if self._touch(key, value) is not _MISSING:
+            return
+
+        self._window[key] = value
+        if len(self._window) > self.window_capacity:
+            self._admit(*self._window.popitem(last=False))
+
+    def clear(self):
+        '''Removes all items from the cache.'''
+        self._window.clear()
+        self._probation.clear()
+        self._protected.clear()
+
+    def _touch(self, key, value=_MISSING):
+        '''Marks key as the most recently used in its segment and promotes
+        probation key to protected segment. Optionally updates the value.
+        Returns the value or _MISSING if nonexistent.
+        '''
+        for memory in (self._protected, self._window):
+            if key in memory:
+                memory.move_to_end(key)
+                if value is not _MISSING:
+                    memory[key] = value
+                return memory[key]
+
+        if key not in self._probation:
+            return _MISSING
+
+        current = self._probation.pop(key)
+        value = current if value is _MISSING else value
+        self._protected[key] = value
+        if len(self._protected) > self.protected_capacity:
+            demoted_key, demoted_value = self._protected.popitem(last=False)
+            self._probation[demoted_key] = demoted_value
+        return value
+
+    def _admit(self, key, value):
+        '''Admits window victim to the probation segment if main cache has
+        free space or the victim is more frequent than the main cache victim.
+        '''
+        if len(self._probation) + len(self._protected) < self.main_capacity:
+            self._probation[key] = value
+            return
+
+        # Cache of capacity one has no main cache to compete for
+        if not self.main_capacity:
+            self.evictions += 1
+            return
+
+        victims = self._probation if self._probation else self._protected
+        victim_key = next(iter(victims))
+        if self.sketch.estimate(key) > self.sketch.estimate(victim_key):
+            del victims[victim_key]
+            self._probation[key] = value
+        self.evictions += 1
+
+
+POLICIES = {
+    'lru': LRU_Cache,
+    '2q': TwoQ_Cache,
+    'arc': ARC_Cache,
+    'tinylfu': TinyLFU_Cache,
+}
+
+
+def make_cache(policy='lru', capacity=5, **kws):
+    '''Returns cache with the named eviction policy.
+
+    Args:
+        policy(str): One of 'lru', '2q', 'arc' or 'tinylfu'. Default 'lru'.
+        capacity(int): Capacity of the cache, 5 by default
+        kws: Keyword arguments passed to the cache class
+    '''
+    assert policy in POLICIES, \
+        'Policy needs to be one of {}.'.format(', '.join(POLICIES))
+    return POLICIES[policy](capacity, **kws)
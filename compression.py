@@ -1,10 +1,279 @@
 ''''Modul contains implementation of Huffman Compression algorithm.'''
 
+import os
 import sys
+import struct
+import zlib
 import warnings
 import heapq
+import itertools
 from collections import deque
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Container header: magic, padding bits, flags, number of symbols, payload
+# length, checksum of the whole container
+_MAGIC = b'HUF1'
+_HEADER = struct.Struct('>4sBBIQI')
+# Offset of the checksum, the last field of the header
+_CRC = struct.Struct('>I')
+_CRC_OFFSET = _HEADER.size - _CRC.size
+# Flag of container encoding bytes, symbols are single bytes
+_BYTES_FLAG = 0x01
+# Code table entry: symbol length in bytes, code length in bits
+_ENTRY = struct.Struct('>BB')
+# Children of missing branch in HuffmanDecoder
+_NO_CHILD = 0x7FFFFFFF
+
+
+def canonical_codes(lengths):
+    '''Returns canonical Huffman codes of symbols with given code lengths.
+    Symbols are sorted by code length and symbol, code of each symbol is the
+    code of the previous one incremented and shifted to its length. The codes
+    are therefore fully described by their lengths.
+
+    Args:
+        lengths(dict): Symbols mapped to code lengths in bits
+    '''
+    codes = {}
+    code = prev_length = 0
+    for symbol, length in sorted(lengths.items(),
+                                 key=lambda item: (item[1], item[0])):
+        assert isinstance(length, int) and length > 0, \
+        'Code length needs to be positive int.'
+        code <<= length - prev_length
+        assert code < (1 << length), 'Code lengths need to be prefix free.'
+        codes[symbol] = format(code, '0{}b'.format(length))
+        code += 1
+        prev_length = length
+    return codes
+
+
+def byte_counts(data):
+    '''Returns dictionary of byte values (as latin-1 characters) mapped to
+    their numbers of occurrences in data. Bytes are histogrammed at once by
+    numpy.bincount if numpy is installed, by Counter otherwise; both
+    return the byte values in ascending order.
+
+    Args:
+        data(bytes-like): Bytes to count
+    '''
+    if numpy is not None:
+        counts = numpy.bincount(numpy.frombuffer(data, numpy.uint8),
+                                minlength=256).tolist()
+        return {chr(byte): count for byte, count in enumerate(counts)
+                if count}
+    return {chr(byte): count
+            for byte, count in sorted(Counter(data).items())}
+
+
+def _container_crc(container):
+    '''Returns CRC32 of the container without its checksum field, so the
+    header fields, the code table and the payload are all covered.
+    '''
+    return zlib.crc32(container[_HEADER.size:],
+                      zlib.crc32(container[:_CRC_OFFSET]))
+
+
+def read_container(container):
+    '''Returns code lengths, payload, number of payload bits of the
+    container returned by HuffmanCompressor.encode_bytes and True if the
+    container encodes bytes. Raises AssertionError if the container is
+    corrupted.
+    '''
+    container = memoryview(container).cast('B')
+    assert len(container) >= _HEADER.size, 'Container is truncated.'
+    magic, padding, flags, n_symbols, n_payload, checksum = \
+        _HEADER.unpack_from(container)
+    assert magic == _MAGIC, 'Container needs to start with magic bytes.'
+    assert _container_crc(container) == checksum, \
+        'Checksum of encoded data failed.'
+
+    binary = bool(flags & _BYTES_FLAG)
+    encoding = 'latin-1' if binary else 'utf-8'
+    lengths = {}
+    offset = _HEADER.size
+    try:
+        for _ in range(n_symbols):
+            symbol_len, code_len = _ENTRY.unpack_from(container, offset)
+            offset += _ENTRY.size
+            symbol = container[offset:offset + symbol_len]
+            assert len(symbol) == symbol_len, 'Container is truncated.'
+            lengths[bytes(symbol).decode(encoding)] = code_len
+            offset += symbol_len
+    except (struct.error, UnicodeDecodeError) as error:
+        raise AssertionError('Code table is corrupted.') from error
+
+    payload = container[offset:]
+    assert (len(lengths) == n_symbols) and (len(payload) == n_payload), \
+        'Code table is corrupted.'
+    return lengths, payload, 8 * n_payload - padding, binary
+
+
+class HuffmanDecoder:
+    '''Table-driven decoder of prefix code. The code tree is stored in flat
+    arrays instead of Node objects, inner nodes are numbered from the root 0.
+    Trees of at most max_rows inner nodes have the whole table built at
+    once in a list. Larger trees, like of large alphabets, have rows built
+    in a dict on their first hit and at most max_rows of them, so memory
+    does not grow with the alphabet. Bytes starting in nodes without row
+    are decoded walking the tree.
+
+    Attributes:
+        symbols(list): Decoded symbols
+        binary(bool): Symbols are latin-1 characters of bytes, decoded
+            string is returned as bytes
+        children(array): children[2 * node + bit] is number of the inner
+            child node, ~index of the symbol for leaf, or _NO_CHILD
+        table(list or dict): Entry of (node << 8 | byte) is tuple of symbols
+            completed by the byte bits and the node where the byte ends
+            shifted by 8, None if the bits leave the tree
+        max_rows(int): Maximum number of nodes with table rows of 256
+            entries, 256 by default
+
+    Methods:
+        decode(data, n_bits): Returns decoded string (bytes if binary) and
+            indicator if the code ended at the end of symbol
+    '''
+
+    max_rows = 256
+
+    def __init__(self, codes, binary=False):
+        assert codes, 'Code table needs to be not empty.'
+
+        self.symbols = list(codes)
+        self.binary = binary
+        self.children = array('i', [_NO_CHILD, _NO_CHILD])
+        for symbol_idx, code in enumerate(codes.values()):
+            assert code and (code.count('0') + code.count('1')
+                             == len(code)), \
+            'Code needs to be not empty binary string.'
+
+            node = 0
+            for bit in code[:-1]:
+                slot = 2 * node + (bit == '1')
+                child = self.children[slot]
+                assert (child == _NO_CHILD) or (child >= 0), \
+                'Code table needs to be prefix free.'
+                if child == _NO_CHILD:
+                    child = self.children[slot] = len(self.children) // 2
+                    self.children.extend((_NO_CHILD, _NO_CHILD))
+                node = child
+
+            slot = 2 * node + (code[-1] == '1')
+            assert self.children[slot] == _NO_CHILD, \
+            'Code table needs to be prefix free.'
+            self.children[slot] = ~symbol_idx
+
+        self._nibbles = {}
+        n_nodes = len(self.children) // 2
+        if n_nodes <= self.max_rows:
+            self.table = [entry for node in range(n_nodes)
+                          for entry in self._row(node)]
+            self._n_rows = n_nodes
+        else:
+            self.table = {}
+            self._n_rows = 0
+
+    def _walk(self, node, bits, n_bits):
+        '''Walks the tree from the node by n_bits of bits, most significant
+        first. Returns string of the completed symbols and the node where
+        the bits end, None if the bits leave the tree.
+        '''
+        children, symbols = self.children, self.symbols
+        chars = []
+        for shift in range(n_bits - 1, -1, -1):
+            node = children[2 * node + ((bits >> shift) & 1)]
+            if node == _NO_CHILD:
+                return None
+            if node < 0:
+                chars.append(symbols[~node])
+                node = 0
+        return ''.join(chars), node
+
+    def _nibble_row(self, node):
+        '''Returns walks of the 16 nibbles from the node, cached.'''
+        row = self._nibbles.get(node)
+        if row is None:
+            row = self._nibbles[node] = [self._walk(node, nibble, 4)
+                                         for nibble in range(16)]
+        return row
+
+    def _row(self, node):
+        '''Returns table entries of all bytes from the node by composing
+        transitions of the two nibbles of the byte, which are walked in the
+        tree only 4 bits at a time.
+        '''
+        row = []
+        for high in self._nibble_row(node):
+            if high is None:
+                row.extend([None] * 16)
+                continue
+            chars, middle = high
+            row.extend(None if low is None else (chars + low[0], low[1] << 8)
+                       for low in self._nibble_row(middle))
+        return row
+
+    def _transition(self, state, byte):
+        '''Returns table entry of the byte from the state missing in the
+        table. Adds row of the node unless max_rows are built, otherwise
+        walks the byte in the tree.
+        '''
+        if self._n_rows < self.max_rows:
+            node = state >> 8
+            self._n_rows += 1
+            self.table.update(zip(range(node << 8, (node + 1) << 8),
+                                  self._row(node)))
+            return self.table[state | byte]
+
+        step = self._walk(state >> 8, byte, 8)
+        return None if step is None else (step[0], step[1] << 8)
+
+    def decode(self, data, n_bits):
+        '''Returns string decoded from the first n_bits of data and True if
+        the code ended at the end of symbol. Raises AssertionError if the
+        bits leave the code tree.
+
+        Whole bytes are decoded by the lookup table, each hit emits all
+        symbols completed within the byte. Bits of the last partial byte are
+        decoded walking the flat tree.
+        '''
+        table, transition = self.table, self._transition
+        n_full = n_bits // 8
+        decoded = []
+        append = decoded.append
+        state = 0
+        try:
+            for byte in data[:n_full]:
+                try:
+                    chars, state = table[state | byte]
+                except KeyError:
+                    chars, state = transition(state, byte)
+                append(chars)
+        except TypeError:
+            # Invalid transition has None entry
+            raise AssertionError('Sum check of binary string failed. ')
+
+        node = state >> 8
+        if n_bits % 8:
+            n_rest = n_bits % 8
+            step = self._walk(node, data[n_full] >> (8 - n_rest), n_rest)
+            if step is None:
+                raise AssertionError('Sum check of binary string failed. ')
+            append(step[0])
+            node = step[1]
+
+        # Parts are joined as string, joining bytes allocates buffer per part
+        decoded = ''.join(decoded)
+        if self.binary:
+            decoded = decoded.encode('latin-1')
+        return decoded, node == 0
 
 
 class Node(tuple):
@@ -42,36 +311,79 @@ class HuffmanCompressor:
     '''Huffman string compression implementation.
 
     Attributes:
-        string(str): String to encode and build Huffman tree.
+        string(str or bytes): String to encode and build Huffman tree. Bytes
+            are encoded with alphabet of 256 byte values and decoded back
+            to bytes.
 
     Methods:
         encode(): Encode string to binary representation
-        decode(string): Decode Huffman binary representation back to string.
+        encode_bytes(): Encode string to self-describing packed container
+        decode(string): Decode Huffman binary representation or container
+            back to string.
+        decode_bytes(data, n_bits): Decode Huffman code packed in bytes.
+        from_codes(codes): Class method creating decoder from code table
+        code_lengths(): Returns code lengths of the characters
     '''
+
+    # Number of characters whose codes are packed at once
+    pack_chunk_size = 8192
+
     def __init__(self, string):
-        assert isinstance(string, str) and string, \
+        self._binary = isinstance(string, (bytes, bytearray, memoryview))
+        if self._binary:
+            string = bytes(string)
+        assert isinstance(string, (str, bytes)) and string, \
         'Argument needs to be a not empty string.'
 
         self.string = string
         self._root = self._build_hf_tree()
         self._encode_map = self._get_encode_map()
+        self._decoder = None
+        self._canonical_map = None
+        self._canonical_decoder = None
 
-    def _build_hf_tree(self):
-        counter = [Node((count, char))
-                   for char, count in Counter(self.string).items()]
+    @classmethod
+    def from_codes(cls, codes):
+        '''Returns compressor encoding and decoding with the code table. String
+        attribute is None and the Huffman tree is not built.
 
-        heapq.heapify(counter)
-        heap = counter
+        Args:
+            codes(dict): Characters mapped to binary code strings
+        '''
+        decoder = HuffmanDecoder(codes)
+
+        compressor = cls.__new__(cls)
+        compressor.string = None
+        compressor._binary = False
+        compressor._root = None
+        compressor._encode_map = dict(codes)
+        compressor._decoder = decoder
+        compressor._canonical_map = None
+        compressor._canonical_decoder = None
+        return compressor
+
+    def _build_hf_tree(self):
+        '''Builds Huffman tree of the symbol counts. Heap entries are ordered
+        by the node tuple (count, symbol) and ties of inner nodes by their
+        creation, so the tree depends only on the counts and not on the
+        order in which they were counted.
+        '''
+        counts = byte_counts(self.string) if self._binary \
+            else Counter(self.string)
+        order = itertools.count()
+        heap = [(count, char, next(order), Node((count, char)))
+                for char, count in sorted(counts.items())]
+        heapq.heapify(heap)
 
         # edge case of one character:
         if len(heap) == 1:
             count = heap[0][0]
             root = Node((count, ''))
-            root.left = heap[0]
+            root.left = heap[0][-1]
             return root
 
         while len(heap) >= 2:
-            node1, node2 = heapq.heappop(heap), heapq.heappop(heap)
+            node1, node2 = heapq.heappop(heap)[-1], heapq.heappop(heap)[-1]
             new_node = Node((node1[0] + node2[0], ''))
 
             if node1 <= node2:
@@ -81,9 +393,9 @@ class HuffmanCompressor:
                 new_node.left = node2
                 new_node.right = node1
 
-            heapq.heappush(heap, new_node)
+            heapq.heappush(heap, (*new_node, next(order), new_node))
 
-        root = heap[0]
+        root = heap[0][-1]
         return root
 
     def _get_encode_map(self):
@@ -118,15 +430,104 @@ class HuffmanCompressor:
 
     def encode(self):
         '''Returns Huffman binary code representation of the string.'''
+        if self._binary:
+            return ''.join(map(self._byte_codes(self._encode_map).__getitem__,
+                               self.string))
         bin_str = ''.join([self._encode_map[char] for char in self.string])
         return bin_str
 
+    @staticmethod
+    def _byte_codes(codes):
+        '''Returns list of codes indexed by byte value, None for bytes
+        without code. Bytes are encoded by indexing the list instead of
+        hashing characters in the encode map.'''
+        byte_codes = [None] * 256
+        for char, code in codes.items():
+            byte_codes[ord(char)] = code
+        return byte_codes
+
+    def code_lengths(self):
+        '''Returns dictionary of characters mapped to their code lengths.'''
+        return {char: len(code) for char, code in self._encode_map.items()}
+
+    def encode_bytes(self):
+        '''Returns bytearray container with the string encoded to packed bits.
+
+        Container starts with header of magic bytes, number of padding bits
+        of the last byte, number of symbols, payload length and CRC32 of the
+        rest of the container. The code table follows, entry of each symbol holds its UTF-8
+        length, code length and UTF-8 bytes. Symbols of bytes are the single
+        bytes, which is marked in the header flags. Codes are canonical, so they
+        are rebuilt from their lengths. The payload of the packed codes comes
+        last.
+        '''
+        canonical_map = self._get_canonical_map()
+        encoding = 'latin-1' if self._binary else 'utf-8'
+        table = bytearray(_HEADER.size)
+        for char, code in canonical_map.items():
+            symbol = char.encode(encoding)
+            assert len(code) < 256, 'Code length needs to fit byte.'
+            table += _ENTRY.pack(len(symbol), len(code))
+            table += symbol
+
+        # Payload is packed behind the table, header is filled in last
+        offset = len(table)
+        container, n_bits = self._pack_bits(self.string, table, canonical_map)
+        _HEADER.pack_into(container, 0, _MAGIC, -n_bits % 8,
+                          _BYTES_FLAG if self._binary else 0,
+                          len(canonical_map), len(container) - offset, 0)
+        with memoryview(container) as view:
+            _CRC.pack_into(container, _CRC_OFFSET, _container_crc(view))
+        return container
+
+    def _get_canonical_map(self):
+        '''Returns canonical codes with lengths of the Huffman tree codes.'''
+        if self._canonical_map is None:
+            self._canonical_map = canonical_codes(self.code_lengths())
+        return self._canonical_map
+
+    def _pack_bits(self, string, packed=None, codes=None):
+        '''Packs codes (encode map by default) of string characters most
+        significant bit first to the end of bytearray (new if not provided).
+        Returns the bytearray and the number of valid bits.
+
+        Codes of a chunk of characters are joined and shifted into an integer
+        accumulator at once, whole bytes of the accumulator are flushed after
+        each chunk. Memory of the binary string is bounded by the chunk.
+        Codes of bytes are gathered from list indexed by the byte values.
+        '''
+        packed = bytearray() if packed is None else packed
+        codes = self._encode_map if codes is None else codes
+        if isinstance(string, bytes):
+            code_of = self._byte_codes(codes).__getitem__
+        else:
+            code_of = codes.__getitem__
+        acc = n_acc = n_bits = 0
+        for idx in range(0, len(string), self.pack_chunk_size):
+            bits = ''.join(map(code_of,
+                               string[idx:idx + self.pack_chunk_size]))
+            acc = (acc << len(bits)) | int(bits, 2)
+            n_acc += len(bits)
+
+            n_rest = n_acc % 8
+            packed += (acc >> n_rest).to_bytes(n_acc // 8, 'big')
+            n_bits += n_acc - n_rest
+            acc &= (1 << n_rest) - 1
+            n_acc = n_rest
+
+        n_bits += n_acc
+        if n_acc:
+            packed.append(acc << (8 - n_acc))
+        return packed, n_bits
+
     def decode(self, bin_str=None, error='raise'):
-        '''Returns string representation of huffman binary code.
+        '''Returns string representation of huffman binary code, bytes if
+        the compressor or the container encodes bytes.
 
         Args:
-            bin_str(string): Huffman encoded string in binary code. Optional,
-                string attribute used if not provided.
+            bin_str(string or bytes): Huffman encoded string in binary code or
+                container returned by encode_bytes. Optional, string attribute
+                used if not provided.
             errors(string): Error handling and encoding sum check.
                 'ignore': Ignores sum check error and strips last bits which
                     does not represent any character in encoded_map
@@ -135,45 +536,65 @@ class HuffmanCompressor:
 
         '''
         bin_str = bin_str if bin_str else self.encode()
+        if isinstance(bin_str, (bytes, bytearray, memoryview)):
+            return self._decode_container(bin_str, error)
+
+        assert isinstance(bin_str, str) and (
+            bin_str.count('0') + bin_str.count('1') == len(bin_str)), \
+        'bin_str needs to be binary sequence.'
+
+        # Pack bits to bytes, last byte is padded by zeros
+        n_bits = len(bin_str)
+        n_bytes = (n_bits + 7) // 8
+        packed = int(bin_str + '0' * (8 * n_bytes - n_bits), 2)
+        return self.decode_bytes(packed.to_bytes(n_bytes, 'big'), n_bits,
+                                 error)
+
+    def _decode_container(self, container, error):
+        '''Returns string decoded from container of encode_bytes. Canonical
+        codes are rebuilt from code lengths of the container, so the container
+        can be decoded by any compressor.
+        '''
+        lengths, payload, n_bits, binary = read_container(container)
+        if (binary == self._binary) and (lengths == self.code_lengths()):
+            if self._canonical_decoder is None:
+                self._canonical_decoder = HuffmanDecoder(
+                    self._get_canonical_map(), self._binary)
+            decoder = self._canonical_decoder
+        else:
+            decoder = HuffmanDecoder(canonical_codes(lengths), binary)
+        return self._decode_packed(decoder, payload, n_bits, error)
+
+    def decode_bytes(self, data, n_bits=None, error='raise'):
+        '''Returns string decoded from Huffman code packed in bytes, most
+        significant bit first. Decoding is driven by the lookup table of
+        HuffmanDecoder built from the encode map on first use.
 
-        decoded_str = ''
-        bit_idx = 0
-        node = self._root
-        while bit_idx < len(bin_str):
-            prev_node = node
-
-            # traverse Huffman tree
-            if bin_str[bit_idx] == '0':
-                node = node.left
-            elif bin_str[bit_idx] == '1':
-                node = node.right
-            else:
-                raise AssertionError('bin_str needs to be binary sequence.')
-
-            # Update decoded string and increase bit index
-            if node:
-                char = node[1]
-                if char:
-                    decoded_str += char
-                bit_idx += 1
+        Args:
+            data(bytes-like): Huffman code packed in bytes
+            n_bits(int): Number of valid bits, the others of the last byte
+                are padding. Default all bits of data.
+            error(string): Error handling and encoding sum check as in decode
+        '''
+        if self._decoder is None:
+            self._decoder = HuffmanDecoder(self._encode_map, self._binary)
+        return self._decode_packed(self._decoder, data, n_bits, error)
 
-            # Jump back to root
-            else:
-                # Prevent infinite loop for example decode
-                # '1' with Huffmant tree [(7, ''), (7, 'A'), None]
-                # or '0' with [(7, ''), None, (7, 'A')]
-                if prev_node is self._root:
-                    self._check_sum(node, 'raise')
-                else:
-                    node = self._root
+    def _decode_packed(self, decoder, data, n_bits, error):
+        data = memoryview(data).cast('B')
+        n_bits = 8 * len(data) if n_bits is None else n_bits
+        assert 0 <= n_bits <= 8 * len(data), \
+        'Number of bits needs to fit the data.'
 
-        # Check sum test
-        last_node = node
-        self._check_sum(last_node, error)
+        decoded_str, complete = decoder.decode(data, n_bits)
 
+        # Check sum test, code ends with character only at the root
+        if not complete:
+            self._check_sum(None, error)
         return decoded_str
 
-    def _check_sum(self, node, error):
+    @staticmethod
+    def _check_sum(node, error):
         '''Checks whether node is leaf node of Huffman Tree and raises
         exception, warning or passes.
         '''
@@ -191,6 +612,303 @@ class HuffmanCompressor:
                 raise NotImplementedError()
 
 
+# Stream header: magic, block size. Frames: container length, container.
+_STREAM_MAGIC = b'HUFS'
+_STREAM_HEADER = struct.Struct('>4sI')
+_FRAME = struct.Struct('>I')
+# Block index behind the end frame, entry: container offset, container
+# length, block length. Footer: index offset, number of blocks, magic.
+_INDEX_ENTRY = struct.Struct('>QII')
+_INDEX_MAGIC = b'HUFI'
+_INDEX_FOOTER = struct.Struct('>QI4s')
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+
+class _BlockReader:
+    '''Reads exact number of bytes from file-like object (with read method)
+    or iterable of bytes-like chunks.'''
+
+    def __init__(self, source):
+        self._read = getattr(source, 'read', None)
+        self._chunks = None if self._read else iter(source)
+        self._buffer = bytearray()
+
+    def read(self, size):
+        '''Returns up to size bytes, less only at the end of the source.'''
+        while len(self._buffer) < size:
+            if self._read:
+                chunk = self._read(size - len(self._buffer))
+            else:
+                chunk = next(self._chunks, b'')
+            if not chunk:
+                break
+            self._buffer += chunk
+
+        block = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return block
+
+
+def _compress_block(block):
+    '''Returns container of the block of bytes.'''
+    return HuffmanCompressor(block).encode_bytes()
+
+
+def _decompress_container(container, error='raise'):
+    '''Returns block of bytes decoded from the container.'''
+    lengths, payload, n_bits, binary = read_container(container)
+    assert binary, 'Stream container needs to encode bytes.'
+    block, complete = HuffmanDecoder(canonical_codes(lengths), True).decode(
+        payload, n_bits)
+    if not complete:
+        HuffmanCompressor._check_sum(None, error)
+    return block
+
+
+def _check_block_size(block_size):
+    '''Validates block size before any block is read, the size needs to fit
+    the stream header.'''
+    assert isinstance(block_size, int) and (0 < block_size < (1 << 32)), \
+    'Block size needs to be positive int.'
+
+
+def _iter_blocks(source, block_size):
+    '''Yields blocks of block_size bytes of the source, last may be shorter.
+    '''
+    reader = _BlockReader(source)
+    while True:
+        block = reader.read(block_size)
+        if not block:
+            break
+        yield block
+
+
+def _iter_stream(blocks, block_size):
+    '''Yields stream header, frames of (block length, container) pairs in
+    order, end frame and block index.'''
+    yield _STREAM_HEADER.pack(_STREAM_MAGIC, block_size)
+    offset = _STREAM_HEADER.size
+    index = bytearray()
+    for block_len, container in blocks:
+        index += _INDEX_ENTRY.pack(offset + _FRAME.size, len(container),
+                                   block_len)
+        offset += _FRAME.size + len(container)
+        yield _FRAME.pack(len(container))
+        yield container
+
+    yield _FRAME.pack(0)
+    index += _INDEX_FOOTER.pack(offset + _FRAME.size,
+                                len(index) // _INDEX_ENTRY.size, _INDEX_MAGIC)
+    yield bytes(index)
+
+
+def iter_compress(source, block_size=DEFAULT_BLOCK_SIZE):
+    '''Compresses bytes of the source in blocks of block_size bytes and
+    yields parts of the compressed stream.
+
+    Every block is compressed by its own HuffmanCompressor, so the codes
+    adapt to the block content and only one block is held in memory. Each
+    frame holds the length of the block container and the container of
+    encode_bytes, the frames end with frame of zero length. Index of block
+    offsets follows, so blocks can be decoded in parallel or randomly
+    accessed.
+
+    Args:
+        source: File-like object opened in binary mode or iterable of bytes
+        block_size(int): Number of bytes compressed at once, 1 MiB default
+    '''
+    _check_block_size(block_size)
+    blocks = ((len(block), _compress_block(block))
+              for block in _iter_blocks(source, block_size))
+    return _iter_stream(blocks, block_size)
+
+
+def _iter_ordered(executor, func, items, max_pending):
+    '''Yields results of func applied to items in the executor in order of
+    the items. At most max_pending items are submitted at once.'''
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def compress_parallel(source, destination, block_size=DEFAULT_BLOCK_SIZE,
+                      max_workers=None, max_pending=None):
+    '''Writes compressed stream of the source to the destination file-like
+    object, blocks are compressed in parallel by worker processes. The
+    stream is the same as of compress_stream. Returns number of written
+    bytes.
+
+    Args:
+        source: File-like object opened in binary mode or iterable of bytes
+        destination: File-like object opened in binary mode
+        block_size(int): Number of bytes compressed at once, 1 MiB default
+        max_workers(int): Number of worker processes, number of CPUs default
+        max_pending(int): Maximum number of blocks submitted to the workers
+            at once, twice max_workers by default. Bounds memory.
+    '''
+    _check_block_size(block_size)
+    blocks = _iter_blocks(source, block_size)
+    max_workers = max_workers if max_workers else os.cpu_count() or 1
+    max_pending = max_pending if max_pending else 2 * max_workers
+    written = 0
+    with ProcessPoolExecutor(max_workers) as executor:
+        block_lens = deque()
+
+        def submitted():
+            for block in blocks:
+                block_lens.append(len(block))
+                yield block
+
+        containers = _iter_ordered(executor, _compress_block, submitted(),
+                                   max_pending)
+        for part in _iter_stream(
+                ((block_lens.popleft(), container)
+                 for container in containers), block_size):
+            destination.write(part)
+            written += len(part)
+    return written
+
+
+def _read_at(archive, offset, size):
+    '''Returns size bytes of seekable file-like object or bytes-like
+    archive at offset.'''
+    if hasattr(archive, 'seek'):
+        archive.seek(offset)
+        data = archive.read(size)
+    else:
+        data = bytes(memoryview(archive)[offset:offset + size])
+    assert len(data) == size, 'Stream is truncated.'
+    return data
+
+
+def read_index(archive):
+    '''Returns list of (container offset, container length, block length)
+    tuples of the blocks of the stream.
+
+    Args:
+        archive: Seekable file-like object opened in binary mode or bytes-like
+            object holding the whole stream
+    '''
+    if hasattr(archive, 'seek'):
+        end = archive.seek(0, 2)
+    else:
+        end = len(memoryview(archive))
+    assert end >= _INDEX_FOOTER.size, 'Stream is truncated.'
+
+    index_offset, n_blocks, magic = _INDEX_FOOTER.unpack(
+        _read_at(archive, end - _INDEX_FOOTER.size, _INDEX_FOOTER.size))
+    assert magic == _INDEX_MAGIC, 'Stream needs to end with block index.'
+    index = _read_at(archive, index_offset, n_blocks * _INDEX_ENTRY.size)
+    return list(_INDEX_ENTRY.iter_unpack(index))
+
+
+def decompress_block(archive, block_idx, index=None):
+    '''Returns block of the stream decoded without decoding the others.
+
+    Args:
+        archive: Seekable file-like object or bytes-like object
+        block_idx(int): Index of the block, block starts at byte
+            block_idx * block_size of the decompressed data
+        index(list): Result of read_index. Optional, read if not provided.
+    '''
+    index = read_index(archive) if index is None else index
+    offset, size, _ = index[block_idx]
+    return _decompress_container(_read_at(archive, offset, size))
+
+
+def decompress_parallel(archive, destination, max_workers=None,
+                        max_pending=None):
+    '''Writes decompressed bytes of the stream to the destination file-like
+    object. Blocks found by the index are decoded in parallel by worker
+    processes and written in order. Returns number of written bytes.
+
+    Args:
+        archive: Seekable file-like object or bytes-like object
+        destination: File-like object opened in binary mode
+        max_workers(int): Number of worker processes, number of CPUs default
+        max_pending(int): Maximum number of blocks submitted to the workers
+            at once, twice max_workers by default. Bounds memory.
+    '''
+    index = read_index(archive)
+    containers = (_read_at(archive, offset, size)
+                  for offset, size, _ in index)
+    max_workers = max_workers if max_workers else os.cpu_count() or 1
+    max_pending = max_pending if max_pending else 2 * max_workers
+    written = 0
+    with ProcessPoolExecutor(max_workers) as executor:
+        for block in _iter_ordered(executor, _decompress_container,
+                                   containers, max_pending):
+            destination.write(block)
+            written += len(block)
+    return written
+
+
+def iter_decompress(source, error='raise'):
+    '''Yields decompressed blocks of bytes of the stream of iter_compress.
+    Memory is bounded by the block size of the stream. Decoder is reused
+    while consecutive blocks have the same code lengths.
+
+    Args:
+        source: File-like object opened in binary mode or iterable of bytes
+        error(string): Error handling and encoding sum check as in
+            HuffmanCompressor.decode
+    '''
+    reader = _BlockReader(source)
+    magic, _ = _STREAM_HEADER.unpack(
+        reader.read(_STREAM_HEADER.size).ljust(_STREAM_HEADER.size, b'\0'))
+    assert magic == _STREAM_MAGIC, 'Stream needs to start with magic bytes.'
+
+    lengths = decoder = None
+    while True:
+        frame = reader.read(_FRAME.size)
+        assert len(frame) == _FRAME.size, 'Stream is truncated.'
+        (size,) = _FRAME.unpack(frame)
+        if not size:
+            break
+
+        container = reader.read(size)
+        assert len(container) == size, 'Stream is truncated.'
+        block_lengths, payload, n_bits, binary = read_container(container)
+        assert binary, 'Stream container needs to encode bytes.'
+        if block_lengths != lengths:
+            lengths = block_lengths
+            decoder = HuffmanDecoder(canonical_codes(lengths), True)
+
+        block, complete = decoder.decode(payload, n_bits)
+        if not complete:
+            HuffmanCompressor._check_sum(None, error)
+        yield block
+
+
+def compress_stream(source, destination, block_size=DEFAULT_BLOCK_SIZE):
+    '''Writes compressed stream of the source to the destination file-like
+    object. Returns number of written bytes.'''
+    _check_block_size(block_size)
+    written = 0
+    for part in iter_compress(source, block_size):
+        destination.write(part)
+        written += len(part)
+    return written
+
+
+def decompress_stream(source, destination, error='raise'):
+    '''Writes decompressed bytes of the stream of compress_stream to the
+    destination file-like object. Returns number of written bytes.'''
+    written = 0
+    for block in iter_decompress(source, error):
+        destination.write(block)
+        written += len(block)
+    return written
+
+
 if __name__ == "__main__":
     codes = {}
 
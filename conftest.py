@@ -7,11 +7,16 @@ import tempfile
 import shutil
 from pathlib import Path
 import heapq
+import random
 import datetime
 import hashlib
 
 from lru_cache import LRU_Cache
+from shared_cache import Shared_LRU_Cache
+from disk_cache import Tiered_LRU_Cache
 from find_files import FileManager
+from find_files import FileFilter
+from file_watcher import inotify_available
 from active_directory import Group
 
 # Task 1: Parameters for testing LRU_Chache class
@@ -33,6 +38,12 @@ invalid_capacity = {
     'no number': 'string'
 }
 
+n_segments = {
+    'single segment': 1,
+    'multiple segments': 3,
+    'segment per entry': 5
+}
+
 # set method
 valid_args = {
     'number': 1,
@@ -41,6 +52,39 @@ valid_args = {
     'arbitrary object': object()
 }
 
+batch_pairs = {
+    'empty batch': [],
+    'updating batch': [(0, 'a'), (2, 'b')],
+    'evicting batch': [(5, 'a'), (6, 'b'), (1, 'c')],
+    'over capacity batch': [(key, -key) for key in range(12)],
+}
+
+
+policy = {
+    'lru': 'lru',
+    '2q': '2q',
+    'arc': 'arc',
+    'tinylfu': 'tinylfu'
+}
+
+scan_resistant_policy = {
+    '2q': '2q',
+    'arc': 'arc',
+    'tinylfu': 'tinylfu'
+}
+
+
+invalid_bytes = {
+    'string': 'str',
+    'too long bytes': b'too long bytes',
+}
+
+invalid_shared_key = {
+    'int': 3,
+    'zero': 0,
+    'too long bytes': b'too long bytes',
+}
+
 
 # fixtures
 @fixture
@@ -59,6 +103,10 @@ def valid_capacity(request):
 def invalid_capacity(request):
     return request.param
 
+@fixture(params=n_segments.values(), ids=n_segments.keys())
+def n_segments(request):
+    return request.param
+
 @fixture(params=valid_args.values(), ids=valid_args.keys())
 def key(request):
     return request.param
@@ -67,6 +115,56 @@ def key(request):
 def value(request):
     return request.param
 
+@fixture(params=batch_pairs.values(), ids=batch_pairs.keys())
+def batch_pairs(request):
+    return request.param
+
+@fixture(params=policy.values(), ids=policy.keys())
+def policy(request):
+    return request.param
+
+@fixture(params=scan_resistant_policy.values(),
+         ids=scan_resistant_policy.keys())
+def scan_resistant_policy(request):
+    return request.param
+
+@fixture
+def shared_cache(standard_capacity):
+    cache = Shared_LRU_Cache(standard_capacity, key_size=8, value_size=8)
+    yield cache
+    cache.close()
+    cache.unlink()
+
+@fixture
+def tiered_cache(standard_capacity, tmp_path):
+    cache = Tiered_LRU_Cache(standard_capacity, str(tmp_path / 'cache.log'))
+    yield cache
+    cache.close()
+
+@fixture(params=invalid_bytes.values(), ids=invalid_bytes.keys())
+def invalid_bytes(request):
+    return request.param
+
+@fixture(params=invalid_shared_key.values(), ids=invalid_shared_key.keys())
+def invalid_shared_key(request):
+    return request.param
+
+@fixture
+def clock():
+
+    class Clock:
+        'Manually advanced clock replacing time.monotonic in tests.'
+        def __init__(self):
+            self.now = 0
+
+        def time(self):
+            return self.now
+
+        def sleep(self, seconds):
+            self.now += seconds
+
+    return Clock()
+
 @fixture
 def full_capacity_cache(cache):
     for key in range(cache.capacity):
@@ -114,10 +212,30 @@ out_query_dict = {
                       'regex': False}
 }
 
+trigram_query_dict = {
+    'substring': {'query': 'subdir1/', 'regex': False},
+    'short substring': {'query': '.c', 'regex': False},
+    'missing substring': {'query': 'subdir9', 'regex': False},
+    'prefix regex': {'query': r'temp_directory/testdir/subdir\d+/.*\.c$',
+                     'regex': True},
+    'no prefix regex': {'query': r'.*t\d\.h$', 'regex': True},
+    'alternation regex': {'query': r'.*subdir1|.*subdir5', 'regex': True},
+}
+
 invalid_query_dict = {
     'number': {'query': 1}
 }
 
+max_pending_dict = {
+    'single directory': 1,
+    'few directories': 3
+}
+
+batch_size_dict = {
+    'directory per batch': 1,
+    'subtree per batch': 64
+}
+
 right_files_dict = {
     'in_extension': set([
         temp_path + '/' + 'testdir/subdir1/a.c',
@@ -127,6 +245,27 @@ right_files_dict = {
     ])
 }
 
+def _filter_paths(*paths):
+    return set(temp_path + '/testdir/' + path for path in paths)
+
+filter_dict = {
+    'max depth': (FileFilter(max_depth=1), _filter_paths('t1.c', 't1.h')),
+    'exclude': (FileFilter(exclude=['subdir3', '*.h', '.gitkeep']),
+                _filter_paths('subdir1/a.c', 'subdir5/a.c', 't1.c')),
+    'prune': (FileFilter(prune=lambda path: not path.endswith('subdir3')
+                         and 'subdir' in path),
+              _filter_paths('t1.c', 't1.h')),
+    'extensions': (FileFilter(extensions={'.h'}),
+                   _filter_paths('subdir1/a.h', 'subdir3/subsubdir1/b.h',
+                                 'subdir5/a.h', 't1.h')),
+    'include': (FileFilter(include=['a.*', 'b.c']),
+                _filter_paths('subdir1/a.c', 'subdir1/a.h', 'subdir5/a.c',
+                              'subdir5/a.h', 'subdir3/subsubdir1/b.c')),
+    'size': (FileFilter(min_size=1), set()),
+    'mtime': (FileFilter(max_depth=1, min_mtime=0, max_mtime=2 ** 40),
+              _filter_paths('t1.c', 't1.h')),
+}
+
 @fixture(scope='class')
 def file_manager():
     return FileManager()
@@ -138,6 +277,37 @@ def temp_directory(src_path=src_path, temp_path=temp_path):
     yield temp_dir
     shutil.rmtree(temp_dir)
 
+@fixture
+def index_tree(tmp_path, monkeypatch, src_path=src_path, temp_path=temp_path):
+    shutil.copytree(src_path, tmp_path / temp_path)
+    monkeypatch.chdir(tmp_path)
+    return temp_path, 'files.idx'
+
+@fixture
+def content_tree(tmp_path):
+    (tmp_path / 'src').mkdir()
+    (tmp_path / 'src' / 'main.c').write_bytes(
+        b'int main() {\n  // TODO: parse args\n  return 0;\n}\n'
+        b'// TODO: free memory\r\n')
+    (tmp_path / 'src' / 'util.h').write_bytes(b'// TODO: header\n')
+    (tmp_path / 'src' / 'empty.c').write_bytes(b'')
+    (tmp_path / 'data.bin').write_bytes(b'TODO\0\x01\x02TODO\n')
+    (tmp_path / 'notes.c').write_bytes(
+        'TODO: caf\u00e9\nTODO TODO\n'.encode() + b'TODO')
+    return tmp_path.as_posix()
+
+@fixture(params=[True, False], ids=['inotify', 'polling'])
+def watch_tree(request, tmp_path):
+    if request.param and not inotify_available():
+        pytest.skip('inotify is not available')
+    (tmp_path / 'src').mkdir()
+    (tmp_path / 'src' / 'main.c').write_bytes(b'')
+    (tmp_path / 'src' / 'main.h').write_bytes(b'')
+    watcher = FileManager().watch_files(
+        tmp_path, '.c', inotify=request.param, interval=0.01)
+    yield tmp_path.as_posix(), watcher
+    watcher.close()
+
 @fixture(params=valid_path_dict.values(), ids=valid_path_dict.keys())
 def valid_path(request):
     return request.param
@@ -150,6 +320,11 @@ def invalid_path(request):
 def in_query(request):
     return request.param
 
+@fixture(params=trigram_query_dict.values(),
+         ids=trigram_query_dict.keys())
+def trigram_query(request):
+    return request.param
+
 @fixture(params=out_query_dict.values(), ids=out_query_dict.keys())
 def out_query(request):
     return request.param
@@ -158,6 +333,18 @@ def out_query(request):
 def invalid_query(request):
     return request.param
 
+@fixture(params=max_pending_dict.values(), ids=max_pending_dict.keys())
+def max_pending(request):
+    return request.param
+
+@fixture(params=batch_size_dict.values(), ids=batch_size_dict.keys())
+def batch_size(request):
+    return request.param
+
+@fixture(params=filter_dict.values(), ids=filter_dict.keys())
+def filters(request):
+    return request.param
+
 @fixture(params=right_files_dict.values(), ids=right_files_dict.keys())
 def right_files(request):
     return request.param
@@ -194,34 +381,34 @@ valid_hf_set_dict = {
         'string': ('Here is the mixed Sequence of 1 number and '
                    'special characters like $ # etc.'),
         'encode_map': {
-            ' ': '00', 'H': '010000', 'S': '010001', 'd': '01001', 'a': '0101',
-            'k': '011000', 'o': '011001', 'b': '011010', 'f': '011011',
-            'p': '011100', 'q': '011101', '#': '011110', '$': '011111',
-            'h': '10000', 'l': '10001', 'm': '10010', 'u': '10011',
-            'c': '1010', 'x': '101100', '.': '1011010', '1': '1011011',
-            'n': '10111', 'e': '110', 's': '11100', 't': '11101',
-            'i': '11110', 'r': '11111'
+            ' ': '00', 'p': '010000', 'q': '010001', 'd': '01001',
+            'h': '01010', 'l': '01011', 'm': '01100', 'u': '01101',
+            'a': '0111', 'i': '1000', 'r': '1001', 'c': '1010', 'x': '101100',
+            '#': '1011010', '$': '1011011', 'n': '10111', 'e': '110',
+            's': '11100', 't': '11101', '.': '1111000', '1': '1111001',
+            'H': '1111010', 'S': '1111011', 'b': '1111100', 'f': '1111101',
+            'k': '1111110', 'o': '1111111'
         },
         'root': [
             (75, ''), (30, ''), (45, ''), (14, ' '), (16, ''), (19, ''),
             (26, ''), None, None, (8, ''), (8, ''), (8, ''), (11, ''),
-            (12, 'e'), (14, ''), (4, ''), (4, 'a'), (4, ''), (4, ''), (4, ''),
-            (4, ''), (5, 'c'), (6, ''), None, None, (6, ''), (8, ''), (2, ''),
-            (2, 'd'), None, None, (2, ''), (2, ''), (2, ''), (2, ''), (2, 'h'),
-            (2, 'l'), (2, 'm'), (2, 'u'), None, None, (3, ''), (3, 'n'),
-            (3, 's'), (3, 't'), (4, 'i'), (4, 'r'), (1, 'H'), (1, 'S'), None,
-            None, (1, 'k'), (1, 'o'), (1, 'b'), (1, 'f'), (1, 'p'), (1, 'q'),
-            (1, '#'), (1, '$'), None, None, None, None, None, None, None, None,
-            (1, 'x'), (2, ''), None, None, None, None, None, None, None, None,
-             None, None, None, None, None, None, None, None, None, None, None,
-             None, None, None, None, None, None, None, None, None, None, None,
-             None, None, (1, '.'), (1, '1'), None, None, None, None
+            (12, 'e'), (14, ''), (4, ''), (4, ''), (4, ''), (4, 'a'), (4, 'i'),
+            (4, 'r'), (5, 'c'), (6, ''), None, None, (6, ''), (8, ''), (2, ''),
+            (2, 'd'), (2, 'h'), (2, 'l'), (2, 'm'), (2, 'u'), None, None, None,
+            None, None, None, None, None, (3, ''), (3, 'n'), (3, 's'),
+            (3, 't'), (4, ''), (4, ''), (1, 'p'), (1, 'q'), None, None, None,
+            None, None, None, None, None, None, None, (1, 'x'), (2, ''), None,
+            None, None, None, None, None, (2, ''), (2, ''), (2, ''), (2, ''),
+            None, None, None, None, None, None, (1, '#'), (1, '$'), (1, '.'),
+            (1, '1'), (1, 'H'), (1, 'S'), (1, 'b'), (1, 'f'), (1, 'k'),
+            (1, 'o'), None, None, None, None, None, None, None, None, None,
+            None, None, None, None, None, None, None, None, None, None, None
         ],
-        'encoded_string': ('01000011011111110001111011100001110110000110001001'
-'01111010110011001001000100011100111011001111010111101011000011001011011001011'
-'01100101111001110010011010110111110001011011101001001110001110011010101111001'
-'01100010010101000001011111101011010111011101111111100001000111110011000110000'
-'1111100011110001101110110101011010')
+        'encoded_string': ('11110101101001110001000111000011101010101100001100'
+'10001011001100100100111101111001000101101110101111010110001111111111110100111'
+'10010010111011010110011111001101001000111101110100100111000100001101010100001'
+'11010110010100101001111001011110101110111010011110000010111000111111011000101'
+'1011001011010001101110110101111000')
     }
 }
 
@@ -283,6 +470,61 @@ def invalid_sum_check_set(request):
 def sum_check_error(request):
     return request.param
 
+stream_bytes_dict = {
+    'empty': b'',
+    'one byte value': b'a' * 100,
+    'text': b'2024-01-01 INFO request served in 12 ms\n' * 50,
+    'all byte values': bytes(range(256)) * 3,
+}
+
+block_size_dict = {
+    'small blocks': 64,
+    'one block': 1 << 20,
+}
+
+invalid_block_size_dict = {
+    'zero': 0,
+    'negative': -1,
+    'above header field': 1 << 32,
+    'float': 1024.0,
+}
+
+@fixture(params=stream_bytes_dict.values(), ids=stream_bytes_dict.keys())
+def stream_bytes(request):
+    return request.param
+
+@fixture(params=block_size_dict.values(), ids=block_size_dict.keys())
+def block_size(request):
+    return request.param
+
+@fixture(params=invalid_block_size_dict.values(),
+         ids=invalid_block_size_dict.keys())
+def invalid_block_size(request):
+    return request.param
+
+byte_str_dict = {
+    'one byte value': b'\x00' * 10,
+    'text': 'Zkou\u0161ka k\u00f3du \u4e2d'.encode() * 20,
+    'all byte values': bytes(range(256)) + bytes(range(0, 256, 3)),
+}
+
+@fixture(params=byte_str_dict.values(), ids=byte_str_dict.keys())
+def byte_str(request):
+    return request.param
+
+@fixture(scope='module')
+def large_alphabet_str():
+    rng = random.Random(0)
+    alphabet = [chr(0x4e00 + idx) for idx in range(2000)]
+    return ''.join(rng.choices(alphabet, k=10_000))
+
+@fixture(scope='module')
+def long_str():
+    rng = random.Random(0)
+    alphabet = 'abcdefghij \n\u00e9\u4e2d'
+    return ''.join(rng.choices(alphabet, weights=range(1, len(alphabet) + 1),
+                               k=10_000))
+
 
 # Task 4: Parameters for testing Group class
 # -------------------------------------------
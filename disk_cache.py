@@ -0,0 +1,258 @@
+'''Modul contains two-tier cache spilling items evicted from in-memory
+LRU_Cache to an append-only log on disk.'''
+
+import os
+import pickle
+import struct
+import tempfile
+
+from lru_cache import LRU_Cache
+
+# Record header: length of the pickled (key, is_live, value) tuple
+_RECORD = struct.Struct('<I')
+
+
+class DiskStore(object):
+    '''Append-only log of pickled key-value records with in-memory index of
+    record offsets. Removed keys are marked by tombstone records, so the log
+    can be reopened and its index rebuilt. Space of overwritten and removed
+    records is reclaimed by compaction.
+
+    Attributes:
+        path: String, path of the log file
+        live_bytes: Integer, size of records of keys present in the store
+        garbage_bytes: Integer, size of records which can be compacted
+        min_compact_bytes: Integer, minimal garbage size for automatic
+            compaction, 1 MiB by default
+        delete: Boolean, the log file is removed on close if True
+
+    Methods:
+        put(key, value): Appends the key-value record
+        get(key[, default]): Returns the value of the key
+        pop(key): Returns the value and removes the key
+        discard(key): Removes the key if present
+        compact(): Rewrites the log with live records only
+        clear(): Removes all records
+        close(): Closes the log file, removes it if delete is True
+    '''
+
+    def __init__(self, path, min_compact_bytes=1 << 20, delete=False):
+        self.path = path
+        self.min_compact_bytes = min_compact_bytes
+        self.delete = delete
+        self.live_bytes = 0
+        self.garbage_bytes = 0
+        self._index = {}
+        self._file = open(path, 'a+b')
+        self._load_index()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def _load_index(self):
+        '''Rebuilds index by scanning records of existing log file.'''
+        self._file.seek(0)
+        offset = 0
+        while True:
+            header = self._file.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                break
+            size = _RECORD.size + _RECORD.unpack(header)[0]
+            key, is_live, _ = pickle.loads(self._file.read(size - _RECORD.size))
+            self._drop(key)
+            if is_live:
+                self._index[key] = (offset, size)
+                self.live_bytes += size
+            else:
+                self.garbage_bytes += size
+            offset += size
+
+    def _append(self, key, is_live, value):
+        data = pickle.dumps((key, is_live, value), pickle.HIGHEST_PROTOCOL)
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        self._file.write(_RECORD.pack(len(data)) + data)
+        return offset, _RECORD.size + len(data)
+
+    def _drop(self, key):
+        '''Removes key from index and accounts its record as garbage.'''
+        location = self._index.pop(key, None)
+        if location:
+            self.live_bytes -= location[1]
+            self.garbage_bytes += location[1]
+        return location
+
+    def _read(self, location):
+        offset, size = location
+        self._file.flush()
+        self._file.seek(offset + _RECORD.size)
+        return pickle.loads(self._file.read(size - _RECORD.size))[2]
+
+    def put(self, key, value):
+        '''Appends the key-value record, replacing previous value.'''
+        self._drop(key)
+        location = self._index[key] = self._append(key, True, value)
+        self.live_bytes += location[1]
+        self._maybe_compact()
+
+    def get(self, key, default=None):
+        '''Returns the value of the key, default if nonexistent.'''
+        location = self._index.get(key)
+        return default if location is None else self._read(location)
+
+    def pop(self, key):
+        '''Returns the value of the key and removes the key from the store.
+        Raises KeyError if nonexistent.
+        '''
+        value = self._read(self._index[key])
+        self.discard(key)
+        return value
+
+    def discard(self, key):
+        '''Removes the key from the store if present.'''
+        if self._drop(key):
+            self.garbage_bytes += self._append(key, False, None)[1]
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self.garbage_bytes > max(self.live_bytes, self.min_compact_bytes):
+            self.compact()
+
+    def compact(self):
+        '''Rewrites the log with records of live keys only.'''
+        self._file.flush()
+        compact_path = self.path + '.compact'
+        index = {}
+        with open(compact_path, 'wb') as compact_file:
+            for key, (offset, size) in self._index.items():
+                self._file.seek(offset)
+                index[key] = (compact_file.tell(), size)
+                compact_file.write(self._file.read(size))
+
+        self._file.close()
+        os.replace(compact_path, self.path)
+        self._file = open(self.path, 'a+b')
+        self._index = index
+        self.garbage_bytes = 0
+
+    def clear(self):
+        '''Removes all records by truncating the log file.'''
+        self._file.truncate(0)
+        self._index.clear()
+        self.live_bytes = 0
+        self.garbage_bytes = 0
+
+    def close(self):
+        '''Closes the log file and removes it if delete is True.'''
+        self._file.close()
+        if self.delete:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class Tiered_LRU_Cache(LRU_Cache):
+    '''Least recently used cache spilling evicted items to DiskStore instead
+    of discarding them. A miss in memory checks the disk tier and promotes
+    the item found there back to memory.
+
+    Attributes:
+        capacity: Positive integer, capacity of the in-memory tier
+        disk: DiskStore holding items evicted from memory
+        memory_hits: Integer, number of hits in the in-memory tier
+        disk_hits: Integer, number of hits in the disk tier
+        misses: Integer, number of keys not found in either tier
+
+    Other keyword arguments (max_weight, weigher, ttl, timer) are passed to
+    LRU_Cache. Items expired in memory are dropped, items spilled to disk
+    keep their expiry time and are dropped when found expired on disk. If
+    path is None, temporary log file is created and removed on close.
+    '''
+
+    def __init__(self, capacity=5, path=None, min_compact_bytes=1 << 20,
+                 **kws):
+        super().__init__(capacity, **kws)
+
+        delete = path is None
+        if delete:
+            handle, path = tempfile.mkstemp(suffix='.log')
+            os.close(handle)
+        self.disk = DiskStore(path, min_compact_bytes, delete)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __contains__(self, key):
+        if super().__contains__(key):
+            return True
+        if key not in self.disk:
+            return False
+        expires = self.disk.get(key)[1]
+        if (expires is not None) and (expires <= self.timer()):
+            self.disk.discard(key)
+            return False
+        return True
+
+    def get(self, key):
+        '''Retrieve item from provided key, promoting it from disk tier on
+        memory miss. Return None if nonexistent in both tiers.
+        '''
+        if super().__contains__(key):
+            self.memory_hits += 1
+            return super().get(key)
+
+        if key in self.disk:
+            value, expires = self.disk.pop(key)
+            now = self.timer()
+            if (expires is None) or (expires > now):
+                self.disk_hits += 1
+                # Promoted item keeps its remaining time to live
+                super().set(key, value,
+                            None if expires is None else expires - now)
+                return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key, value, ttl=None):
+        '''Set the value of the key in memory tier, dropping its stale copy
+        from disk tier.
+        '''
+        self.disk.discard(key)
+        super().set(key, value, ttl)
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set_many(self, pairs, ttl=None):
+        pairs = list(pairs.items() if hasattr(pairs, 'items') else pairs)
+        for key, _ in pairs:
+            self.disk.discard(key)
+        super().set_many(pairs, ttl)
+
+    def clear(self):
+        '''Removes all items from memory tier and disk tier.'''
+        super().clear()
+        self.disk.clear()
+
+    def compact(self):
+        '''Compacts disk tier.'''
+        self.disk.compact()
+
+    def close(self):
+        '''Closes disk tier log file.'''
+        self.disk.close()
+
+    def _on_evict(self, key, value):
+        # Disk record holds the value with its absolute expiry time
+        self.disk.put(key, (value, self._expires.get(key)))
@@ -0,0 +1,349 @@
+'''Modul contains persistent index of files in directory tree, which can be
+searched without touching the file system and refreshed incrementally.'''
+
+import os
+import re
+import time
+import pickle
+import pathlib
+import itertools
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Regular expression characters which end the literal prefix of the pattern
+_REGEX_SPECIAL = frozenset('.^$*+?{}[]()|\\')
+_REGEX_QUANTIFIERS = frozenset('*?{')
+
+
+def _literal_prefix(pattern):
+    '''Returns literal string every match of the regular expression starts
+    with. Conservative, returns empty string if the pattern has alternation
+    or starts with a group or a class.
+    '''
+    if '|' in pattern:
+        return ''
+
+    prefix, idx = [], 0
+    while idx < len(pattern):
+        char = pattern[idx]
+        if (idx == 0) and (char == '^'):
+            idx += 1
+            continue
+        if char == '\\':
+            escaped = pattern[idx + 1:idx + 2]
+            if (not escaped) or escaped.isalnum():
+                break
+            prefix.append(escaped)
+            idx += 2
+            continue
+        if char in _REGEX_SPECIAL:
+            # Quantified character is optional or repeated
+            if prefix and (char in _REGEX_QUANTIFIERS):
+                prefix.pop()
+            break
+        prefix.append(char)
+        idx += 1
+    return ''.join(prefix)
+
+
+class TrigramIndex:
+    '''Inverted index of file path trigrams answering substring queries by
+    intersecting posting lists instead of testing every path. Paths are
+    identified by integer ids (their position in paths list) and postings
+    are kept in compact arrays of unsigned ints sorted by id.
+
+    Attributes:
+        paths(list): Indexed file paths, path id is its position
+
+    Methods:
+        build(paths): Bulk builds the index from iterable of paths
+        candidates(literal): Returns ids of paths which may contain literal
+        find_files(query, regex): Returns list of paths matching query
+    '''
+
+    def __init__(self, paths=()):
+        self.paths = []
+        self._postings = {}
+        self.build(paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def build(self, paths):
+        '''Bulk builds the index from iterable of paths, replacing the
+        previous content.
+        '''
+        self.build_groups([('', list(paths))])
+
+    def build_groups(self, groups):
+        '''Bulk builds the index from iterable of (prefix, paths) tuples,
+        where all paths of the group start with the prefix, like the files
+        of one directory. Trigrams of the prefix are computed once per group.
+        Postings are collected to lists and frozen into arrays once.
+        '''
+        self.paths = []
+        postings = {}
+        for prefix, paths in groups:
+            first = len(self.paths)
+            self.paths.extend(paths)
+            path_ids = range(first, len(self.paths))
+            if not path_ids:
+                continue
+
+            prefix_trigrams = {prefix[idx:idx + 3]
+                               for idx in range(len(prefix) - 2)}
+            for trigram in prefix_trigrams:
+                postings.setdefault(trigram, []).extend(path_ids)
+
+            # Trigrams crossing the end of the prefix start in its last two
+            # characters
+            start = max(0, len(prefix) - 2)
+            for path_id, path in zip(path_ids, paths):
+                for trigram in {path[idx:idx + 3]
+                                for idx in range(start, len(path) - 2)}:
+                    if trigram in prefix_trigrams:
+                        continue
+                    posting = postings.get(trigram)
+                    if posting is None:
+                        postings[trigram] = [path_id]
+                    else:
+                        posting.append(path_id)
+
+        self._postings = {trigram: array('I', posting)
+                          for trigram, posting in postings.items()}
+
+    def candidates(self, literal):
+        '''Returns sorted ids of paths which may contain the literal. Each
+        of them contains the rarest trigrams of the literal. Returns None if
+        the literal is too short or too common to use the index.
+        '''
+        if len(literal) < 3:
+            return None
+
+        postings = []
+        for trigram in {literal[idx:idx + 3]
+                        for idx in range(len(literal) - 2)}:
+            posting = self._postings.get(trigram)
+            if posting is None:
+                return []
+            postings.append(posting)
+
+        # Trigrams shared by most paths (like the root directory) select
+        # nothing, scanning all paths is cheaper than intersecting them
+        postings.sort(key=len)
+        if 2 * len(postings[0]) > len(self.paths):
+            return None
+
+        # Intersect starting with the shortest posting list, candidates are
+        # verified by the caller, so much longer lists are not worth merging
+        path_ids = set(postings[0])
+        for posting in postings[1:]:
+            if len(posting) > 8 * len(path_ids):
+                break
+            path_ids.intersection_update(posting)
+        return sorted(path_ids)
+
+    def find_files(self, query, regex=False):
+        '''Returns list of indexed files matching query. Regular expression
+        candidates are selected by its literal prefix.
+
+        Args:
+          query(str): string to match file path
+          regex(bool): Indicator if query is regular expression. Default False.
+        '''
+        assert isinstance(query, str), 'Query needs to be string.'
+
+        if regex:
+            match = re.compile(query).match
+            path_ids = self.candidates(_literal_prefix(query))
+        else:
+            match = lambda file_path: query in file_path
+            path_ids = self.candidates(query)
+
+        paths = self.paths if path_ids is None else (
+            self.paths[path_id] for path_id in path_ids)
+        return [file_path for file_path in paths if match(file_path)]
+
+
+class FileIndex:
+    '''Index of file paths in directory tree. Each directory is stored with
+    its modification time, subdirectories and files. Refresh stats every
+    indexed directory, but lists only directories whose modification time
+    changed, as adding, removing or renaming entries changes the mtime of
+    their parent directory.
+
+    Attributes:
+        root(str): Root directory of the index in posix format
+        dirs(dict): Directory path mapped to tuple of modification time in
+            nanoseconds, list of subdirectory paths and list of file paths
+        max_workers(int): Maximum number of threads scanning directories
+
+    Methods:
+        build(): Scans whole directory tree
+        refresh(): Rescans directories changed since last scan
+        find_files(query, regex): Returns list of indexed files matching query
+        trigrams(): Returns trigram index of the indexed files
+        save(path): Persists index to file
+        load(path): Class method loading index from file
+    '''
+
+    # Directories modified less than this many nanoseconds before their scan
+    # are rescanned on next refresh, as file system mtime granularity may
+    # hide changes made in the same tick as the scan.
+    mtime_guard_ns = 2 * 10 ** 9
+
+    def __init__(self, root, max_workers=10):
+        assert isinstance(root, (str, pathlib.Path)), \
+        'Path needs to be str or pathlib.Path object.'
+        assert os.path.isdir(root), \
+        'Directory not found in {}'.format(os.getcwd())
+
+        self.root = pathlib.Path(root).as_posix()
+        self.max_workers = max_workers
+        self.dirs = {}
+        self._trigrams = None
+
+    def __len__(self):
+        return sum(len(files) for _, _, files in self.dirs.values())
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(
+            files for _, _, files in self.dirs.values())
+
+    def _scan_dir(self, path):
+        '''Returns modification time, subdirectories and files of directory.
+        Returns None if directory does not exist anymore.
+        '''
+        prefix = '' if path == '.' else path.rstrip('/') + '/'
+        subdirs, files = [], []
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(prefix + entry.name)
+                    elif entry.is_file():
+                        files.append(prefix + entry.name)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+        if time.time_ns() - mtime < self.mtime_guard_ns:
+            mtime = -1
+        return mtime, subdirs, files
+
+    def _mtimes(self, paths):
+        '''Returns list of modification times of directories, None for
+        directories which do not exist anymore.'''
+        mtimes = []
+        for path in paths:
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except (FileNotFoundError, NotADirectoryError):
+                mtimes.append(None)
+        return mtimes
+
+    def _scan_tree(self, executor, dirs):
+        '''Scans directories level by level including their new
+        subdirectories. Returns number of scanned directories.
+        '''
+        scanned = 0
+        while dirs:
+            next_dirs = []
+            for path, scan in zip(dirs, executor.map(self._scan_dir, dirs)):
+                old_subdirs = self.dirs[path][1] if path in self.dirs else []
+                if scan is None:
+                    self._remove_tree(path)
+                    continue
+
+                self.dirs[path] = scan
+                self._trigrams = None
+                scanned += 1
+                subdirs = set(scan[1])
+                for subdir in old_subdirs:
+                    if subdir not in subdirs:
+                        self._remove_tree(subdir)
+                next_dirs.extend(
+                    subdir for subdir in scan[1] if subdir not in self.dirs)
+            dirs = next_dirs
+        return scanned
+
+    def _remove_tree(self, path):
+        '''Removes directory and its indexed subdirectories.'''
+        stack = [path]
+        self._trigrams = None
+        while stack:
+            entry = self.dirs.pop(stack.pop(), None)
+            if entry:
+                stack.extend(entry[1])
+
+    def build(self):
+        '''Scans whole directory tree. Returns number of scanned
+        directories.'''
+        self.dirs.clear()
+        self._trigrams = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return self._scan_tree(executor, [self.root])
+
+    def refresh(self):
+        '''Rescans directories whose modification time changed since last
+        scan, new directories and removes deleted ones. Returns number of
+        rescanned directories.
+        '''
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            paths = list(self.dirs) if self.dirs else [self.root]
+            # Each thread stats a chunk of directories, submitting a task
+            # per stat costs more than the stat itself
+            size = -(-len(paths) // self.max_workers)
+            mtimes = itertools.chain.from_iterable(executor.map(
+                self._mtimes, (paths[idx:idx + size]
+                               for idx in range(0, len(paths), size))))
+            changed = [
+                path for path, mtime in zip(paths, mtimes)
+                if (path not in self.dirs) or (mtime != self.dirs[path][0])]
+
+            # Deleted directories return no scan and are removed with their
+            # indexed subtree
+            return self._scan_tree(executor, changed)
+
+    def trigrams(self):
+        '''Returns trigram index of the indexed files. The index is built on
+        first use and rebuilt after any directory was rescanned.
+        '''
+        if self._trigrams is None:
+            self._trigrams = TrigramIndex()
+            self._trigrams.build_groups(
+                ('' if path == '.' else path.rstrip('/') + '/', files)
+                for path, (_, _, files) in self.dirs.items())
+        return self._trigrams
+
+    def find_files(self, query, regex=False):
+        '''Returns list of indexed files matching query. Candidates are
+        selected by the trigram index.
+
+        Args:
+          query(str): string to match file path
+          regex(bool): Indicator if query is regular expression. Default False.
+        '''
+        return self.trigrams().find_files(query, regex)
+
+    def save(self, path):
+        '''Persists index to file. The file is replaced atomically.'''
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'wb') as index_file:
+            pickle.dump((self.root, self.dirs), index_file,
+                        pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, max_workers=10):
+        '''Returns index loaded from file.'''
+        with open(path, 'rb') as index_file:
+            root, dirs = pickle.load(index_file)
+
+        index = cls.__new__(cls)
+        index.root = root
+        index.max_workers = max_workers
+        index.dirs = dirs
+        index._trigrams = None
+        return index
@@ -0,0 +1,295 @@
+'''Modul contains watchers keeping set of files matching query up to date and
+reporting files added to and removed from directory tree.'''
+
+import os
+import sys
+import time
+import errno
+import struct
+import select
+import ctypes
+import ctypes.util
+from collections import deque
+
+from file_index import FileIndex
+
+# Constants of inotify(7)
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_DONT_FOLLOW = 0x02000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (_IN_CREATE | _IN_DELETE | _IN_MOVED_FROM | _IN_MOVED_TO
+               | _IN_DELETE_SELF | _IN_ONLYDIR | _IN_DONT_FOLLOW)
+# Event header: wd, mask, cookie, len
+_EVENT = struct.Struct('iIII')
+
+ADDED = 'added'
+REMOVED = 'removed'
+
+
+def _load_libc():
+    '''Returns libc with inotify functions, None if not available.'''
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                       ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+_libc = _load_libc()
+
+
+class FileWatcher:
+    '''Base class of the watchers. Holds the set of files matching the query
+    and turns changes of the directory tree into events.
+
+    Attributes:
+        root(str): Watched directory in posix format
+        files(set): Paths of the files currently matching the query
+        interval(float): Seconds between checks of the tree while waiting
+
+    Methods:
+        poll(timeout): Returns list of (event, path) tuples, event is
+            'added' or 'removed'
+        events(): Iterates over events as they come, blocks while waiting
+        close(): Releases resources of the watcher
+    '''
+
+    def __init__(self, root, match, interval=1.0):
+        assert interval > 0, 'Interval needs to be positive.'
+
+        self.root = root
+        self.interval = interval
+        self.files = set()
+        self._match = match
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def poll(self, timeout=0):
+        '''Returns list of events of changes observed within timeout seconds.
+        Returns as soon as any matching file is added or removed.
+        '''
+        deadline = time.monotonic() + timeout
+        while True:
+            events = self._check(max(0, deadline - time.monotonic()))
+            if events or (time.monotonic() >= deadline):
+                return events
+
+    def events(self):
+        '''Iterates over (event, path) tuples, blocks while waiting.'''
+        while True:
+            yield from self.poll(self.interval)
+
+    def close(self):
+        '''Releases resources of the watcher.'''
+
+    def _check(self, timeout):
+        '''Waits at most timeout seconds and returns list of events.'''
+        raise NotImplementedError
+
+    def _add(self, events, file_path):
+        if self._match(file_path) and (file_path not in self.files):
+            self.files.add(file_path)
+            events.append((ADDED, file_path))
+
+    def _remove(self, events, file_path):
+        if file_path in self.files:
+            self.files.remove(file_path)
+            events.append((REMOVED, file_path))
+
+
+class PollingWatcher(FileWatcher):
+    '''Watcher polling FileIndex of the tree. Each check stats the indexed
+    directories and lists again only those whose modification time changed,
+    files of the changed directories are compared with their previous scan.
+    '''
+
+    def __init__(self, root, match, interval=1.0, max_workers=10):
+        super().__init__(root, match, interval)
+        self._index = FileIndex(root, max_workers)
+        self._index.build()
+        self.files = {file_path for file_path in self._index
+                      if match(file_path)}
+
+    def _check(self, timeout):
+        old_dirs = dict(self._index.dirs)
+        self._index.refresh()
+        events = self._diff(old_dirs, self._index.dirs)
+        if not events:
+            time.sleep(min(timeout, self.interval))
+        return events
+
+    def _diff(self, old_dirs, new_dirs):
+        events = []
+        for path, entry in old_dirs.items():
+            new_entry = new_dirs.get(path)
+            # Unchanged directories keep their entry object
+            if new_entry is entry:
+                continue
+
+            new_files = set(new_entry[2]) if new_entry else set()
+            for file_path in entry[2]:
+                if file_path not in new_files:
+                    self._remove(events, file_path)
+            for file_path in new_files.difference(entry[2]):
+                self._add(events, file_path)
+
+        for path, entry in new_dirs.items():
+            if path not in old_dirs:
+                for file_path in entry[2]:
+                    self._add(events, file_path)
+        return events
+
+
+class InotifyWatcher(FileWatcher):
+    '''Watcher receiving changes of the tree from the Linux kernel through
+    inotify, without scanning directories. Every directory of the tree is
+    watched, new directories are watched before they are scanned, so files
+    created meanwhile are reported by the scan or by the event. When the
+    event queue overflows, the whole tree is scanned again.
+    '''
+
+    def __init__(self, root, match, interval=1.0):
+        assert _libc is not None, 'Inotify is not available.'
+        super().__init__(root, match, interval)
+
+        self._fd = _libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._dirs = {}
+        self._wds = {}
+        self._add_tree([], root)
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _check(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+
+        events = []
+        try:
+            while True:
+                self._handle(events, os.read(self._fd, 64 * 1024))
+        except BlockingIOError:
+            pass
+        return events
+
+    def _handle(self, events, buffer):
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, name_len = _EVENT.unpack_from(buffer, offset)
+            name = buffer[offset + _EVENT.size:
+                          offset + _EVENT.size + name_len].rstrip(b'\0')
+            offset += _EVENT.size + name_len
+
+            if mask & _IN_Q_OVERFLOW:
+                self._resync(events)
+                continue
+            if mask & _IN_IGNORED:
+                self._dirs.pop(self._wds.pop(wd, None), None)
+                continue
+            if (wd not in self._wds) or not name:
+                continue
+
+            path = self._wds[wd].rstrip('/') + '/' + os.fsdecode(name)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    self._add_tree(events, path)
+                elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    self._remove_tree(events, path)
+            elif mask & (_IN_CREATE | _IN_MOVED_TO):
+                if os.path.isfile(path):
+                    self._add(events, path)
+            elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                self._remove(events, path)
+
+    def _watch(self, path):
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            # Directory removed before it was watched
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return False
+            raise OSError(error, os.strerror(error), path)
+
+        self._dirs[path] = wd
+        self._wds[wd] = path
+        return True
+
+    def _add_tree(self, events, root):
+        '''Watches and scans directory and its subdirectories.'''
+        dirs = deque([root])
+        while dirs:
+            path = dirs.popleft()
+            if (path in self._dirs) or not self._watch(path):
+                continue
+
+            prefix = '' if path == '.' else path.rstrip('/') + '/'
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            dirs.append(prefix + entry.name)
+                        elif entry.is_file():
+                            self._add(events, prefix + entry.name)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+    def _remove_tree(self, events, root):
+        '''Stops watching the directory and its subdirectories and removes
+        their files. Watches of moved directories are not removed by kernel.
+        '''
+        prefix = root + '/'
+        for path in [path for path in self._dirs
+                     if (path == root) or path.startswith(prefix)]:
+            wd = self._dirs.pop(path)
+            self._wds.pop(wd, None)
+            _libc.inotify_rm_watch(self._fd, wd)
+
+        for file_path in [file_path for file_path in self.files
+                          if file_path.startswith(prefix)]:
+            self._remove(events, file_path)
+
+    def _resync(self, events):
+        '''Scans the whole tree again after lost events.'''
+        for wd in self._wds:
+            _libc.inotify_rm_watch(self._fd, wd)
+        self._dirs.clear()
+        self._wds.clear()
+
+        old_files, self.files = self.files, set()
+        self._add_tree([], self.root)
+        for file_path in old_files - self.files:
+            events.append((REMOVED, file_path))
+        for file_path in self.files - old_files:
+            events.append((ADDED, file_path))
+
+
+def inotify_available():
+    '''Returns True if inotify can be used on this platform.'''
+    return _libc is not None
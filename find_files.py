@@ -1,20 +1,136 @@
 '''Modul contains File Manager class to handle various file system tasks'''
 
 import os
+import copy
+import mmap
+import asyncio
+import fnmatch
+import functools
 import pathlib
 from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+from concurrent.futures import FIRST_COMPLETED
 from collections import deque
 import re
 
+from file_index import FileIndex
+from file_watcher import PollingWatcher
+from file_watcher import InotifyWatcher
+from file_watcher import inotify_available
+
+
+class FileFilter:
+    '''Filters evaluated during the walk of find_files. Directories pruned by
+    the filter are never scheduled for scanning, so their subtrees cost
+    neither system calls nor thread submissions. Size and modification time
+    are read from the stat of the directory entry only if they are limited.
+
+    Filter is passed to worker processes, so the prune callable needs to be
+    picklable (module level function) when processes are used.
+
+    Attributes:
+        max_depth(int): Maximum depth of scanned directories below the root,
+            files directly in the root are at depth 0. Unlimited if None.
+        include(list): Glob patterns, file name needs to match one of them
+        exclude(list): Glob patterns of excluded file and directory names,
+            for example ['.git', 'node_modules', '*.pyc']
+        prune(callable): Returns True for directory path not to be scanned
+        extensions(set): Accepted file extensions, for example {'.c', '.h'}
+        min_size(int), max_size(int): Range of file size in bytes
+        min_mtime(float), max_mtime(float): Range of file modification time
+            in seconds since the epoch
+    '''
+
+    def __init__(self, max_depth=None, include=None, exclude=None,
+                 prune=None, extensions=None, min_size=None, max_size=None,
+                 min_mtime=None, max_mtime=None):
+        assert (max_depth is None) or (isinstance(max_depth, int)
+                                       and (max_depth >= 0)), \
+        'Max depth needs to be non-negative int.'
+        assert (prune is None) or callable(prune), \
+        'Prune needs to be callable.'
+
+        self.max_depth = max_depth
+        self.include = list(include) if include else None
+        self.exclude = list(exclude) if exclude else None
+        self.prune = prune
+        self.extensions = set(extensions) if extensions else None
+        self.min_size = min_size
+        self.max_size = max_size
+        self.min_mtime = min_mtime
+        self.max_mtime = max_mtime
+        self._root_prefix = None
+
+    def for_root(self, root):
+        '''Returns copy of the filter measuring depth from the root.'''
+        bound = copy.copy(self)
+        bound._root_prefix = '' if root == '.' else root.rstrip('/') + '/'
+        return bound
+
+    def depth(self, path):
+        '''Returns depth of the directory below the root, 0 for the root.'''
+        if path.rstrip('/') + '/' == self._root_prefix:
+            return 0
+        return path[len(self._root_prefix):].count('/') + 1
+
+    def scan_dir(self, path, name):
+        '''Returns True if the subdirectory should be scanned.'''
+        if (self.max_depth is not None) and \
+                (self.depth(path) > self.max_depth):
+            return False
+        if self.exclude and any(fnmatch.fnmatchcase(name, pattern)
+                                for pattern in self.exclude):
+            return False
+        return not (self.prune and self.prune(path))
+
+    def accept_file(self, entry):
+        '''Returns True if the file entry of os.scandir passes the filter.'''
+        name = entry.name
+        if self.extensions and (os.path.splitext(name)[1]
+                                not in self.extensions):
+            return False
+        if self.include and not any(fnmatch.fnmatchcase(name, pattern)
+                                    for pattern in self.include):
+            return False
+        if self.exclude and any(fnmatch.fnmatchcase(name, pattern)
+                                for pattern in self.exclude):
+            return False
+
+        if (self.min_size is None) and (self.max_size is None) and \
+                (self.min_mtime is None) and (self.max_mtime is None):
+            return True
+
+        stat = entry.stat()
+        return not (((self.min_size is not None)
+                     and (stat.st_size < self.min_size))
+                    or ((self.max_size is not None)
+                        and (stat.st_size > self.max_size))
+                    or ((self.min_mtime is not None)
+                        and (stat.st_mtime < self.min_mtime))
+                    or ((self.max_mtime is not None)
+                        and (stat.st_mtime > self.max_mtime)))
+
 
 class FileManager:
     '''File Manager class handling varous tasks on files and folders
 
     Methods:
         find_files: Return the list of files matching regular expression
+        iter_files: Return the iterator of files matching regular expression
+        afind_files: Coroutine returning the list of matching files
+        aiter_files: Return the asynchronous iterator of matching files
+        index_files: Return the persistent index of files in directory tree
+        search_content: Return the iterator of lines matching content pattern
+        watch_files: Return the watcher of files matching regular expression
     '''
 
-    def find_files(self, path, query, regex=False, max_workers=10):
+    # Files with NUL byte in their beginning are considered binary
+    binary_sniff_size = 8192
+
+    def find_files(self, path, query, regex=False, max_workers=10,
+                   max_pending=None, processes=False, batch_size=64,
+                   filters=None):
         """Find all files beneath path with matching query.
 
         Note that a path may contain further subdirectories
@@ -26,72 +142,452 @@ class FileManager:
           query(str): string to match file path
           path(str or pathlib.Path): path of the file system
           regex(bool): Indicator if query is regular expression. Default False.
-          max_workers: Maximum number of the threads, 10 by default
+          max_workers: Maximum number of the threads, 10 by default,
+            default of the executor if None
+          max_pending: Maximum number of directories submitted to the threads
+            at once, twice max_workers by default
+          processes(bool): Indicator if worker processes are used instead of
+            threads. Default False. Worth for regular expressions when
+            matching, not I/O, dominates.
+          batch_size(int): Number of directories of the subtree scanned by
+            worker process before it returns the found files, 64 by default
+          filters(FileFilter): Depth, name, size and modification time
+            filters pruning the walk. Optional.
 
         Returns:
            a list of paths
         """
 
-        # Initiate concurrent breath first search using threads
-        futures = deque()
-        files = []
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures.append(executor.submit(
-                self._find_files, path, query, regex))
-            while futures:
-                future = futures.popleft()
-
-                # Raise if thread return exception
-                if future.exception():
-                    raise future.exception()
-
-                # If thread is completed extend found files and start
-                # new threads for each subdirectory
-                elif future.done():
-                    subdirs, found_files = future.result()
-                    files.extend(found_files)
-                    for subdir in subdirs:
-                        futures.append(
-                            executor.submit(
-                                self._find_files, subdir, query, regex))
-
-                # If thread not finished yet, place thread at the end
-                # of the queue
-                else:
-                    futures.append(future)
-
-        return files
-
-    def _find_files(self, path, query, regex=False):
-        '''Returns list of querying files in specified directory (path) and
-        list of child directories. Method is used for internal purposes and is
-        wrapped into multi-threading interface to return files from whole
-        directory tree.
+        return list(self.iter_files(path, query, regex, max_workers,
+                                    max_pending, processes, batch_size,
+                                    filters))
+
+    def iter_files(self, path, query, regex=False, max_workers=10,
+                   max_pending=None, processes=False, batch_size=64,
+                   filters=None):
+        """Iterate over files beneath path with matching query. Matching paths
+        are yielded as soon as their directory is scanned.
+
+        Arguments are validated immediately, the search starts with the first
+        iteration. Only max_pending directories are scanned ahead of the
+        consumer, so slow consumer slows down the search (back-pressure).
+        Closing the iterator, for example by breaking the loop over it,
+        cancels the directories not scanned yet.
+
+        Args:
+          query(str): string to match file path
+          path(str or pathlib.Path): path of the file system
+          regex(bool): Indicator if query is regular expression. Default False.
+          max_workers: Maximum number of the threads, 10 by default,
+            default of the executor if None
+          max_pending: Maximum number of directories submitted to the threads
+            at once, twice max_workers by default
+          processes(bool): Indicator if worker processes are used instead of
+            threads. Default False. Worth for regular expressions when
+            matching, not I/O, dominates.
+          batch_size(int): Number of directories of the subtree scanned by
+            worker process before it returns the found files, 64 by default
+          filters(FileFilter): Depth, name, size and modification time
+            filters pruning the walk. Optional.
+
+        Returns:
+           an iterator of paths
+        """
+
+        match = self._compile_query(path, query, regex)
+        max_workers = self._max_workers(max_workers, processes)
+        max_pending = max_pending if max_pending else 2 * max_workers
+        root = self._root(path)
+        filters = self._bind_filters(filters, root)
+
+        if processes:
+            assert isinstance(batch_size, int) and (batch_size > 0), \
+            'Batch size needs to be positive int.'
+            executor_cls = ProcessPoolExecutor
+            scan = functools.partial(
+                self._scan_subtree, query=query, regex=regex,
+                batch_size=batch_size, filters=filters)
+        else:
+            executor_cls = ThreadPoolExecutor
+            scan = functools.partial(
+                self._find_files, match=match, filters=filters)
+
+        return self._iter_files(
+            root, scan, executor_cls(max_workers), max_pending)
+
+    def _iter_files(self, root, scan, executor, max_pending, shutdown=True):
+        '''Generator of the concurrent breath first search. Scan callable
+        returns unscanned subdirectories and found files of the directory and
+        runs in the executor threads or processes. Executor is shut down at
+        the end unless shutdown is False, so its owner can keep using it.
+
+        Directories wait in the queue until one of the bounded number of
+        pending futures completes, so the main thread sleeps instead of
+        polling. Next directories are submitted before the found files are
+        yielded, so workers keep scanning while the consumer is busy.
+        '''
+        dirs = deque()
+        pending = {executor.submit(scan, root)}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                # Raises if thread returned exception
+                found_files = []
+                for future in done:
+                    subdirs, files = future.result()
+                    found_files.extend(files)
+                    dirs.extend(subdirs)
+
+                while dirs and (len(pending) < max_pending):
+                    pending.add(executor.submit(scan, dirs.popleft()))
+
+                yield from found_files
+        finally:
+            if shutdown:
+                executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                for future in pending:
+                    future.cancel()
+
+    async def afind_files(self, path, query, regex=False, max_workers=10,
+                          max_pending=None, filters=None):
+        """Coroutine finding all files beneath path with matching query
+        without blocking the event loop.
+
+        Args:
+          query(str): string to match file path
+          path(str or pathlib.Path): path of the file system
+          regex(bool): Indicator if query is regular expression. Default False.
+          max_workers: Maximum number of the threads scanning directories,
+            10 by default, default of the executor if None. Threads are not
+            shared with the default executor of the event loop.
+          max_pending: Maximum number of directories submitted to the threads
+            at once, twice max_workers by default
+          filters(FileFilter): Depth, name, size and modification time
+            filters pruning the walk. Optional.
+
+        Returns:
+           a list of paths
+        """
+        return [file_path async for file_path in self.aiter_files(
+            path, query, regex, max_workers, max_pending, filters)]
+
+    def aiter_files(self, path, query, regex=False, max_workers=10,
+                    max_pending=None, filters=None):
+        """Asynchronous iterator over files beneath path with matching query.
+        Directories are scanned by a bounded pool of threads of its own,
+        matching paths are yielded as soon as their directory is scanned.
+        Arguments are the same as of afind_files.
+
+        Returns:
+           an asynchronous iterator of paths
+        """
+        match = self._compile_query(path, query, regex)
+        max_workers = self._max_workers(max_workers)
+        max_pending = max_pending if max_pending else 2 * max_workers
+        root = self._root(path)
+        scan = functools.partial(self._find_files, match=match,
+                                 filters=self._bind_filters(filters, root))
+        return self._aiter_files(root, scan, max_workers, max_pending)
+
+    async def _aiter_files(self, root, scan, max_workers, max_pending):
+        '''Asynchronous generator of the concurrent breath first search. The
+        same as _iter_files, except that directories are scanned with
+        run_in_executor and the event loop awaits their completion.
+        '''
+        loop = asyncio.get_running_loop()
+        dirs = deque()
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        pending = {loop.run_in_executor(executor, scan, root)}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+
+                # Raises if thread returned exception
+                found_files = []
+                for future in done:
+                    subdirs, files = future.result()
+                    found_files.extend(files)
+                    dirs.extend(subdirs)
+
+                while dirs and (len(pending) < max_pending):
+                    pending.add(loop.run_in_executor(
+                        executor, scan, dirs.popleft()))
+
+                for file_path in found_files:
+                    yield file_path
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def index_files(self, path, index_path=None, max_workers=10):
+        """Return index of files beneath path, which answers find_files
+        queries without touching the file system.
+
+        If index_path holds index of the same directory, the index is loaded
+        and refreshed incrementally: only directories whose modification time
+        changed are scanned again. Otherwise the whole tree is scanned. The
+        index is saved back to index_path.
+
+        Args:
+          path(str or pathlib.Path): path of the file system
+          index_path(str): path of the index file. Optional, index is not
+            persisted if None.
+          max_workers: Maximum number of the threads, 10 by default
+
+        Returns:
+           FileIndex object
+        """
+        index = FileIndex(path, max_workers)
+        if index_path and os.path.exists(index_path):
+            saved_index = FileIndex.load(index_path, max_workers)
+            if saved_index.root == index.root:
+                index = saved_index
+
+        index.refresh()
+        if index_path:
+            index.save(index_path)
+        return index
+
+    def search_content(self, path, name_query, content_pattern, regex=False,
+                       max_workers=10, max_pending=None, max_matches=None,
+                       filters=None):
+        """Iterate over lines of files beneath path matching content pattern.
+        Files are selected by name_query as in find_files, memory mapped and
+        searched by the compiled bytes regular expression. Directories are
+        scanned and files searched by the same pool of max_workers threads.
+        Binary files are skipped. Lines are yielded as soon as their file is
+        searched, lines of one file in order.
+
+        Args:
+          path(str or pathlib.Path): path of the file system
+          name_query(str): string to match file path
+          content_pattern(str or bytes): regular expression searched in the
+            file content, str is encoded to UTF-8
+          regex(bool): Indicator if name_query is regular expression.
+            Default False.
+          max_workers: Maximum number of the threads, 10 by default,
+            default of the executor if None
+          max_pending: Maximum number of directories and of files submitted
+            to the threads at once, twice max_workers by default
+          max_matches(int): Maximum number of matching lines per file.
+            Unlimited if None.
+          filters(FileFilter): Depth, name, size and modification time
+            filters pruning the walk. Optional.
+
+        Returns:
+           an iterator of (path, line number, line) tuples
+        """
+        assert isinstance(content_pattern, (str, bytes)), \
+        'Content pattern needs to be str or bytes.'
+        assert (max_matches is None) or (isinstance(max_matches, int)
+                                         and (max_matches > 0)), \
+        'Max matches needs to be positive int.'
+
+        if isinstance(content_pattern, str):
+            content_pattern = content_pattern.encode()
+        pattern = re.compile(content_pattern, re.MULTILINE)
+
+        match = self._compile_query(path, name_query, regex)
+        max_workers = self._max_workers(max_workers)
+        max_pending = max_pending if max_pending else 2 * max_workers
+        root = self._root(path)
+        scan = functools.partial(self._find_files, match=match,
+                                 filters=self._bind_filters(filters, root))
+        search = functools.partial(
+            self._search_file, pattern=pattern, max_matches=max_matches)
+
+        # Walk and search share the executor, which the search shuts down
+        executor = ThreadPoolExecutor(max_workers)
+        files = self._iter_files(root, scan, executor, max_pending,
+                                 shutdown=False)
+        return self._search_content(files, search, executor, max_pending)
+
+    def _search_content(self, files, search, executor, max_pending):
+        '''Generator searching files yielded by the file iterator in the
+        executor threads, which also run the walk of the iterator. As in
+        _iter_files only max_pending files are submitted at once and the main
+        thread waits for any of them.
         '''
+        pending = set()
+        try:
+            for file_path in files:
+                pending.add(executor.submit(search, file_path))
+                if len(pending) < max_pending:
+                    continue
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+
+            for future in pending:
+                yield from future.result()
+        finally:
+            files.close()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _search_file(self, path, pattern, max_matches):
+        '''Returns list of (path, line number, line) tuples of the lines of
+        the file matching the pattern. The file is memory mapped, so the
+        pattern runs over its bytes without reading them to Python objects
+        first. Each line is reported once, line numbers are counted only
+        in the bytes between the matches. Binary and unreadable files return no lines.
+        '''
+        try:
+            with open(path, 'rb') as file:
+                if not os.fstat(file.fileno()).st_size:
+                    return []
+                with mmap.mmap(file.fileno(), 0,
+                               access=mmap.ACCESS_READ) as data:
+                    if data.find(b'\0', 0, self.binary_sniff_size) != -1:
+                        return []
+                    return self._match_lines(path, data, pattern,
+                                             max_matches)
+        except OSError:
+            return []
+
+    def _match_lines(self, path, data, pattern, max_matches):
+        '''Returns matching lines of the memory mapped file content.'''
+        lines = []
+        line_no, line_start, pos = 1, 0, 0
+        while (max_matches is None) or (len(lines) < max_matches):
+            found = pattern.search(data, pos)
+            if found is None:
+                break
+
+            start = data.rfind(b'\n', 0, found.start()) + 1
+            end = data.find(b'\n', found.start())
+            end = len(data) if end == -1 else end
+            line_no += data[line_start:start].count(b'\n')
+            line_start = start
+
+            line = data[start:end].rstrip(b'\r')
+            lines.append((path, line_no, line.decode(errors='replace')))
+            # Continue after the line, empty match needs to move forward
+            pos = end + 1
+            if pos > len(data):
+                break
+        return lines
 
+    def watch_files(self, path, query, regex=False, interval=1.0,
+                    inotify=None):
+        """Return watcher of files beneath path with matching query. Its files
+        attribute holds the initial result set, poll(timeout) and events()
+        report files added and removed since as ('added', path) and
+        ('removed', path) tuples.
+
+        On Linux changes are received from the kernel through inotify, other
+        platforms poll the modification time of the directories and list
+        again only the changed ones.
+
+        Args:
+          query(str): string to match file path
+          path(str or pathlib.Path): path of the file system
+          regex(bool): Indicator if query is regular expression. Default False.
+          interval(float): Seconds between polls, 1 by default
+          inotify(bool): Indicator if inotify is used. Default None, used
+            when available.
+
+        Returns:
+           FileWatcher object, to be closed after use
+        """
+        match = self._compile_query(path, query, regex)
+        if inotify is None:
+            inotify = inotify_available()
+
+        watcher_cls = InotifyWatcher if inotify else PollingWatcher
+        return watcher_cls(self._root(path), match, interval)
+
+    def _compile_query(self, path, query, regex):
+        '''Validates search arguments and returns callable matching file path
+        against the query. Regular expression is compiled once per search.
+        '''
         assert isinstance(query, str), 'Query needs to be string.'
         assert isinstance(path, (str, pathlib.Path)), \
         'Path needs to be str or pathlib.Path object.'
+        assert os.path.isdir(path), \
+        'Directory not found in {}'.format(os.getcwd())
 
-        path = pathlib.Path(path) if isinstance(path, str) else path
-
-        assert path.is_dir(), 'Directory not found in {}'.format(os.getcwd())
+        return self._matcher(query, regex)
 
+    @staticmethod
+    def _matcher(query, regex):
+        '''Returns callable matching file path against the query.'''
         if regex:
-            query = re.compile(query)
+            return re.compile(query).match
 
-        subdirs, files = [], []
-        for p in path.iterdir():
+        return lambda file_path: query in file_path
 
-            if p.is_dir() and not p.is_symlink():
-                subdirs.append(p)
+    def _bind_filters(self, filters, root):
+        '''Validates filters and binds them to the root of the search.'''
+        if filters is None:
+            return None
+        assert isinstance(filters, FileFilter), \
+        'Filters need to be FileFilter object.'
+        return filters.for_root(root)
 
-            if p.is_file():
-                file_path = p.as_posix()
+    def _max_workers(self, max_workers, processes=False):
+        '''Returns number of workers, the default of the executor if
+        max_workers is None.
+        '''
+        if max_workers:
+            return max_workers
+        if processes:
+            return os.cpu_count() or 1
+        return min(32, (os.cpu_count() or 1) + 4)
+
+    def _root(self, path):
+        '''Returns root directory of the search in posix format.'''
+        return pathlib.Path(path).as_posix()
+
+    def _find_files(self, path, match, filters=None):
+        '''Returns list of querying files in specified directory (path) and
+        list of child directories. Method is used for internal purposes and is
+        wrapped into multi-threading interface to return files from whole
+        directory tree.
 
-                if ((regex and query.match(file_path))
-                    or ((not regex) and (query in file_path))):
+        Entries are read with os.scandir, whose cached file type information
+        avoids stat system call per entry (except of symbolic links). Paths
+        are joined in posix format. Subdirectories pruned by the filters are
+        not returned.
+        '''
+        prefix = '' if path == '.' else path.rstrip('/') + '/'
+
+        subdirs, files = [], []
+        with os.scandir(path) as entries:
+            for entry in entries:
+
+                if entry.is_dir(follow_symlinks=False):
+                    subdir = prefix + entry.name
+                    if (filters is None) or filters.scan_dir(
+                            subdir, entry.name):
+                        subdirs.append(subdir)
 
-                    files.append(file_path)
+                elif entry.is_file():
+                    file_path = prefix + entry.name
+                    if match(file_path) and ((filters is None)
+                                             or filters.accept_file(entry)):
+                        files.append(file_path)
 
         return subdirs, files
+
+    def _scan_subtree(self, path, query, regex, batch_size, filters=None):
+        '''Scans subtree of the directory (path) depth first in worker process
+        until batch_size directories are scanned. Returns list of subtree
+        directories left unscanned and list of querying files, so the files
+        travel between processes in batches.
+        '''
+        match = self._matcher(query, regex)
+        dirs, files = [path], []
+        for _ in range(batch_size):
+            if not dirs:
+                break
+            subdirs, found_files = self._find_files(
+                dirs.pop(), match, filters)
+            dirs.extend(subdirs)
+            files.extend(found_files)
+
+        return dirs, files
@@ -1,42 +1,546 @@
-from collections import deque
+import sys
+import time
+import heapq
+import asyncio
+import threading
+import functools
+import itertools
+from collections import OrderedDict
+from collections import defaultdict
+from collections import namedtuple
 
-class LRU_Cache(object):
-    '''Least recently used cache class.
+class Cache(object):
+    '''Interface of the cache with bounded capacity. Subclasses implement the
+    eviction policy in get and set methods.
 
     Attributes:
         capacity: Positive integer, capacity of the cache memory
-        memory: Dictionary, hash map storing key-value pairs
-        lru: Key of the least recently used key-value pair in cache
+        evictions: Integer, number of items removed by the eviction policy
 
     Methods:
-        put(key1, value1, ... [key_value_pairs]):
+        set(key, value):
             Inserts the key-value pair in cache
-        get(key1, .... [key_array_like])
+        get(key)
             Returns the value from the cache, None if key does not exists
+        set_many(mapping_or_pairs):
+            Inserts the key-value pairs in cache
+        get_many(keys):
+            Returns the list of values from the cache, None for each key
+            which does not exists
+        clear():
+            Removes all items from the cache
     '''
 
     def __init__(self, capacity=5):
-        # Initialize class variables
         assert isinstance(capacity, int) and (capacity > 0), \
             'Capacity needs to be positive int.'
 
         self.capacity = capacity
-        self.memory = dict()
-        self._lru = deque()
+        self.evictions = 0
+
+    def __len__(self):
+        raise NotImplementedError()
+
+    def __contains__(self, key):
+        raise NotImplementedError()
 
     def get(self, key):
-        'Retrieve item from provided key. Return None if nonexistent.'
+        raise NotImplementedError()
+
+    def set(self, key, value):
+        raise NotImplementedError()
+
+    def get_many(self, keys):
+        'Retrieve list of items from provided keys.'
+        return [self.get(key) for key in keys]
+
+    def set_many(self, pairs):
+        'Set the values of the keys from mapping or iterable of pairs.'
+        pairs = pairs.items() if hasattr(pairs, 'items') else pairs
+        for key, value in pairs:
+            self.set(key, value)
+
+    def clear(self):
+        raise NotImplementedError()
+
+
+class LRU_Cache(Cache):
+    '''Least recently used cache class.
+
+    Attributes:
+        capacity: Positive integer, capacity of the cache memory
+        max_weight: Positive number, maximum total weight of the values in
+            cache memory. Optional, only count of items is bounded if None.
+        weigher: Callable returning weight of the value, sys.getsizeof by
+            default. Used only with max_weight.
+        ttl: Positive number, default time to live of the items in seconds.
+            Optional, items never expire if None.
+        timer: Callable returning current time in seconds, time.monotonic by
+            default
+        memory: Ordered dictionary, hash map storing key-value pairs ordered
+            from the least recently used (first) to the most recently used
+            (last) key
+        weight: Number, total weight of the values in cache memory
+        evictions: Integer, number of items removed over capacity or weight
+
+    Methods:
+        set(key, value[, ttl]):
+            Inserts the key-value pair in cache
+        get(key)
+            Returns the value from the cache, None if key does not exists
+        set_many(mapping_or_pairs[, ttl]):
+            Inserts the key-value pairs in cache
+        get_many(keys):
+            Returns the list of values from the cache, None for each key
+            which does not exists
+        expire():
+            Removes all expired items from the cache
+        clear():
+            Removes all items from the cache
+    '''
+
+    # Maximum number of expired items removed by a single set operation
+    sweep_size = 4
+
+    def __init__(self, capacity=5, max_weight=None, weigher=sys.getsizeof,
+                 ttl=None, timer=time.monotonic):
+        # Initialize class variables
+        super().__init__(capacity)
+        assert (max_weight is None) or (max_weight > 0), \
+            'Max weight needs to be positive number.'
+        assert (ttl is None) or (ttl > 0), 'TTL needs to be positive number.'
+
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self.ttl = ttl
+        self.timer = timer
+        self.memory = OrderedDict()
+        self.weight = 0
+
+        self._weights = {}
+        self._expires = {}
+        self._expiry_heap = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self.memory)
+
+    def __contains__(self, key):
+        if self._expires and self._is_expired(key):
+            self._remove(key)
+        return key in self.memory
+
+    def get(self, key):
+        '''Retrieve item from provided key and mark it as the most recently
+        used. Return None if nonexistent or expired.
+        '''
+        if self._expires and self._is_expired(key):
+            self._remove(key)
+            return None
+
         try:
-            return self.memory[key]
+            self.memory.move_to_end(key)
         except KeyError:
             return None
+        return self.memory[key]
+
+    def set(self, key, value, ttl=None):
+        '''Set the value of the key and mark it as the most recently used.
+        If the cache is at capacity or weight limit remove the least recently
+        used items. Optional ttl overrides the default time to live.
+        '''
+        tracked = ((self.max_weight is not None) or ttl or self.ttl
+                   or self._expires)
+        if tracked and not self._admit(key, value, ttl):
+            return
+
+        memory = self.memory
+        memory[key] = value
+        memory.move_to_end(key)
+
+        if (len(memory) > self.capacity) or (tracked and self._overweight()):
+            self._evict()
+
+    def get_many(self, keys):
+        '''Retrieve list of items from provided keys and mark them as the most
+        recently used in the order of keys. None is returned for nonexistent
+        or expired keys.
+        '''
+        if self._expires:
+            return [self.get(key) for key in keys]
+
+        memory = self.memory
+        move_to_end = memory.move_to_end
+        values = []
+        for key in keys:
+            if key in memory:
+                move_to_end(key)
+                values.append(memory[key])
+            else:
+                values.append(None)
+        return values
+
+    def set_many(self, pairs, ttl=None):
+        '''Set the values of the keys from mapping or iterable of key-value
+        pairs and mark them as the most recently used in the order of pairs.
+        Least recently used items over capacity or weight limit are removed
+        once after the whole batch is inserted.
+        '''
+        memory = self.memory
+        move_to_end = memory.move_to_end
+        admit = self._admit
+        tracked = ((self.max_weight is not None) or (self.ttl is not None)
+                   or (ttl is not None) or bool(self._expires))
+        pairs = pairs.items() if hasattr(pairs, 'items') else pairs
+        for key, value in pairs:
+            if tracked and not admit(key, value, ttl):
+                continue
+            memory[key] = value
+            move_to_end(key)
+
+        self._evict()
+
+    def expire(self):
+        '''Removes all expired items from the cache.'''
+        self._sweep(len(self._expiry_heap))
+
+    def clear(self):
+        '''Removes all items from the cache.'''
+        self.memory.clear()
+        self._weights.clear()
+        self._expires.clear()
+        self._expiry_heap.clear()
+        self.weight = 0
+
+    def _admit(self, key, value, ttl):
+        '''Updates weight and expiry bookkeeping of the item about to be set.
+        Returns False if the value alone exceeds max_weight and therefore is
+        not cached.
+        '''
+        if self.max_weight is not None:
+            weight = self.weigher(value)
+            if weight > self.max_weight:
+                self._remove(key)
+                return False
+            self.weight += weight - self._weights.get(key, 0)
+            self._weights[key] = weight
+
+        ttl = ttl if ttl else self.ttl
+        if ttl:
+            expires = self.timer() + ttl
+            self._expires[key] = expires
+            heapq.heappush(
+                self._expiry_heap, (expires, next(self._counter), key))
+            self._sweep(self.sweep_size)
+        elif self._expires:
+            self._expires.pop(key, None)
+
+        return True
+
+    def _overweight(self):
+        return (self.max_weight is not None) and (self.weight > self.max_weight)
+
+    def _evict(self):
+        '''Removes least recently used items until the cache fits its
+        capacity and weight limit.'''
+        while (len(self.memory) > self.capacity) or self._overweight():
+            key, value = self.memory.popitem(last=False)
+            self.weight -= self._weights.pop(key, 0)
+            self.evictions += 1
+            self._on_evict(key, value)
+            self._expires.pop(key, None)
+
+    def _on_evict(self, key, value):
+        '''Hook called with each evicted item. Subclasses can override it to
+        keep evicted items elsewhere. Expiry time of the item is still in
+        _expires while the hook runs.'''
+
+    def _remove(self, key):
+        self.memory.pop(key, None)
+        self.weight -= self._weights.pop(key, 0)
+        self._expires.pop(key, None)
+
+    def _is_expired(self, key):
+        expires = self._expires.get(key)
+        return (expires is not None) and (expires <= self.timer())
+
+    def _sweep(self, n_items):
+        '''Removes up to n_items expired items in order of expiry. Heap entries
+        of keys which were updated or removed meanwhile are skipped.
+        '''
+        heap = self._expiry_heap
+        now = self.timer()
+        while heap and n_items and (heap[0][0] <= now):
+            expires, _, key = heapq.heappop(heap)
+            if self._expires.get(key) == expires:
+                self._remove(key)
+                n_items -= 1
+
+        # Rebuild heap when stale entries of updated keys dominate
+        if len(heap) > 2 * len(self._expires) + self.sweep_size:
+            heap[:] = [(expires, next(self._counter), key)
+                       for key, expires in self._expires.items()]
+            heapq.heapify(heap)
+
+CacheInfo = namedtuple(
+    'CacheInfo', ['hits', 'misses', 'evictions', 'size', 'capacity'])
+
+
+def memoize(capacity=128, key=None):
+    '''Decorator wrapping function with LRU_Cache of its results.
+
+    Args:
+        capacity(int): Capacity of the cache, 128 by default
+        key(callable): Function called with the arguments of the wrapped
+            function returning hashable cache key. Needed for unhashable
+            arguments. By default the key is built from positional and
+            keyword arguments.
+
+    Returns:
+        decorator, the wrapped function exposes cache_info() returning
+        CacheInfo(hits, misses, evictions, size, capacity) and cache_clear()
+    '''
+    assert (key is None) or callable(key), 'Key needs to be callable.'
+
+    def decorator(func):
+        cache = LRU_Cache(capacity)
+        stats = [0, 0]  # hits, misses
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kws):
+            cache_key = key(*args, **kws) if key else _make_key(args, kws)
+
+            with lock:
+                if cache_key in cache:
+                    stats[0] += 1
+                    return cache.get(cache_key)
+                stats[1] += 1
+
+            result = func(*args, **kws)
+            with lock:
+                cache.set(cache_key, result)
+            return result
+
+        def cache_info():
+            with lock:
+                return CacheInfo(stats[0], stats[1], cache.evictions,
+                                 len(cache), cache.capacity)
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+                cache.evictions = 0
+                stats[:] = [0, 0]
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
+
+
+def _make_key(args, kws):
+    'Returns hashable key from positional and keyword arguments.'
+    if not kws:
+        return args
+    return args + (_make_key,) + tuple(sorted(kws.items()))
+
+
+class Concurrent_LRU_Cache(Cache):
+    '''Thread-safe least recently used cache. The key space is sharded over
+    independently locked LRU segments, so threads touching different segments
+    do not contend for the same lock.
+
+    Attributes:
+        capacity: Positive integer, total capacity of the cache memory
+        n_segments: Positive integer, number of segments not above capacity.
+            Default is the capacity capped to 16 segments.
+        max_weight: Positive number, maximum total weight of the values split
+            evenly over segments. Optional, other keyword arguments as
+            weigher or ttl are passed to each LRU_Cache segment.
+        segments: List of LRU_Cache objects, each holding a slice of capacity
+        locks: List of locks guarding the segment with the same index
+        evictions: Integer, number of items evicted from all segments
+
+    Methods:
+        set(key, value):
+            Inserts the key-value pair in cache
+        get(key)
+            Returns the value from the cache, None if key does not exists
+        set_many(mapping_or_pairs):
+            Inserts the key-value pairs in cache
+        get_many(keys):
+            Returns the list of values from the cache, None for each key
+            which does not exists
+        clear():
+            Removes all items from all segments
+    '''
+
+    def __init__(self, capacity=5, n_segments=None, max_weight=None, **kws):
+        # Cache.__init__ is not called, evictions are counted by the segments
+        assert isinstance(capacity, int) and (capacity > 0), \
+            'Capacity needs to be positive int.'
+
+        n_segments = n_segments if n_segments else min(capacity, 16)
+        assert isinstance(n_segments, int) and (0 < n_segments <= capacity), \
+            'Number of segments needs to be positive int not above capacity.'
+
+        self.capacity = capacity
+
+        # Spread the remainder of capacity over the first segments
+        size, remainder = divmod(capacity, n_segments)
+        segment_weight = max_weight / n_segments if max_weight else None
+        self.segments = [
+            LRU_Cache(size + (idx < remainder), segment_weight, **kws)
+            for idx in range(n_segments)]
+        self.locks = [threading.Lock() for _ in range(n_segments)]
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    def __contains__(self, key):
+        idx = self._segment_idx(key)
+        with self.locks[idx]:
+            return key in self.segments[idx]
+
+    @property
+    def evictions(self):
+        return sum(segment.evictions for segment in self.segments)
+
+    def _segment_idx(self, key):
+        return hash(key) % len(self.segments)
+
+    def get(self, key):
+        '''Retrieve item from provided key and mark it as the most recently
+        used in its segment. Return None if nonexistent.
+        '''
+        idx = self._segment_idx(key)
+        with self.locks[idx]:
+            return self.segments[idx].get(key)
+
+    def set(self, key, value, ttl=None):
+        '''Set the value of the key and mark it as the most recently used in
+        its segment. If the segment is at capacity remove its least recently
+        used item.
+        '''
+        idx = self._segment_idx(key)
+        with self.locks[idx]:
+            self.segments[idx].set(key, value, ttl)
+
+    def get_many(self, keys):
+        '''Retrieve list of items from provided keys. Keys are grouped by
+        segment, so each segment lock is taken once per batch. None is
+        returned for nonexistent keys.
+        '''
+        keys = list(keys)
+        positions = defaultdict(list)
+        for pos, key in enumerate(keys):
+            positions[self._segment_idx(key)].append(pos)
+
+        values = [None] * len(keys)
+        for idx, segment_positions in positions.items():
+            with self.locks[idx]:
+                segment_values = self.segments[idx].get_many(
+                    keys[pos] for pos in segment_positions)
+            for pos, value in zip(segment_positions, segment_values):
+                values[pos] = value
+        return values
+
+    def set_many(self, pairs, ttl=None):
+        '''Set the values of the keys from mapping or iterable of key-value
+        pairs. Pairs are grouped by segment, so each segment lock is taken
+        once per batch.
+        '''
+        pairs = pairs.items() if hasattr(pairs, 'items') else pairs
+        segment_pairs = defaultdict(list)
+        for key, value in pairs:
+            segment_pairs[self._segment_idx(key)].append((key, value))
+
+        for idx, batch in segment_pairs.items():
+            with self.locks[idx]:
+                self.segments[idx].set_many(batch, ttl)
+
+    def clear(self):
+        '''Removes all items from all segments, each under its lock.'''
+        for lock, segment in zip(self.locks, self.segments):
+            with lock:
+                segment.clear()
+
+
+class Async_Cache(object):
+    '''Asyncio cache layer coalescing concurrent loads of the same key. On a
+    miss, the first task starts the loader and other tasks missing the same
+    key await the same in-flight load instead of calling the loader again.
+    Loader exceptions are propagated to all waiting tasks and never cached.
+
+    Attributes:
+        cache: Cache object storing loaded values, LRU_Cache of capacity
+            by default
+        loads: Integer, number of loader calls
+
+    Methods:
+        get_or_load(key, loader):
+            Coroutine returning the cached value or the value loaded by
+            awaiting loader(key)
+        get(key)
+            Returns the value from the cache, None if key does not exists
+        set(key, value):
+            Inserts the key-value pair in cache
+    '''
+
+    def __init__(self, capacity=5, cache=None):
+        self.cache = cache if cache is not None else LRU_Cache(capacity)
+        self.loads = 0
+        self._loading = {}
+
+    def __len__(self):
+        return len(self.cache)
+
+    def __contains__(self, key):
+        return key in self.cache
+
+    def get(self, key):
+        '''Retrieve item from provided key. Return None if nonexistent.'''
+        return self.cache.get(key)
 
     def set(self, key, value):
-        '''Set the value if the key is not present in the cache
-        If the cache is at capacity remove the oldest item.
+        '''Set the value of the key in the underlying cache.'''
+        self.cache.set(key, value)
+
+    async def get_or_load(self, key, loader):
+        '''Returns cached value of the key. On a miss awaits loader(key) and
+        caches its result. Concurrent misses of the same key share one load,
+        which keeps running even if some of the waiting tasks are cancelled.
+
+        Args:
+            key: Hashable key of the value
+            loader: Coroutine function called with the key returning value
         '''
-        self.memory[key] = value
-        self._lru.appendleft(key)
+        if key in self.cache:
+            return self.cache.get(key)
+
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            task.add_done_callback(self._retrieve_exception)
+            self._loading[key] = task
+        return await asyncio.shield(task)
 
-        if len(self.memory) > self.capacity:
-            del self.memory[self._lru.pop()]
+    @staticmethod
+    def _retrieve_exception(task):
+        '''Marks loader exception as retrieved. If all waiting tasks were
+        cancelled, no shield retrieves it and asyncio would log it as never
+        retrieved.
+        '''
+        if not task.cancelled():
+            task.exception()
+
+    async def _load(self, key, loader):
+        self.loads += 1
+        try:
+            value = await loader(key)
+            self.cache.set(key, value)
+            return value
+        finally:
+            del self._loading[key]
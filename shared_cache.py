@@ -0,0 +1,285 @@
+'''Modul contains least recently used cache of bytes values stored in shared
+memory, so one cache can be used by multiple processes at once.'''
+
+import struct
+import zlib
+import multiprocessing
+from multiprocessing import shared_memory
+
+# Header: n_slots, key_size, value_size, n_buckets, head, tail, size, free
+_HEADER = struct.Struct('<8q')
+# Slot header: prev, next, chain, key_len, value_len, key_hash
+_SLOT = struct.Struct('<5iI')
+_BUCKET = struct.Struct('<i')
+_NIL = -1
+
+
+class Shared_LRU_Cache(object):
+    '''Least recently used cache of bytes values kept in a shared memory
+    arena. The arena holds a fixed-slot hash table with chaining and a doubly
+    linked recency list, both addressed by slot indexes, so that any process
+    attached to the arena sees the same entries and recency order.
+
+    Operations are guarded by a multiprocessing lock. Processes attaching to
+    an existing arena by name need the lock of the creating process, which is
+    easiest achieved by passing the cache object itself to the worker process
+    (it pickles as a name and lock and re-attaches on unpickling).
+
+    Attributes:
+        name: String, name of the shared memory block
+        capacity: Positive integer, number of slots of the cache memory
+        key_size: Positive integer, maximum length of the key in bytes
+        value_size: Positive integer, maximum length of the value in bytes
+
+    Methods:
+        set(key, value):
+            Inserts the key-value pair in cache
+        get(key)
+            Returns the value from the cache, None if key does not exists
+        close():
+            Detaches this process from the shared memory
+        unlink():
+            Destroys the shared memory block, called by the creator once
+    '''
+
+    def __init__(self, capacity=5, key_size=64, value_size=1024, name=None,
+                 lock=None):
+        # Attaching process needs the lock guarding the arena of its creator
+        assert (name is None) or lock, \
+            'Lock of the creating process needs to be passed with name.'
+        self._lock = lock if lock else multiprocessing.Lock()
+
+        if name is None:
+            assert isinstance(capacity, int) and (capacity > 0), \
+                'Capacity needs to be positive int.'
+            assert isinstance(key_size, int) and (key_size > 0), \
+                'Key size needs to be positive int.'
+            assert isinstance(value_size, int) and (value_size > 0), \
+                'Value size needs to be positive int.'
+
+            n_buckets = 1 << (2 * capacity - 1).bit_length()
+            slot_size = _SLOT.size + key_size + value_size
+            size = (_HEADER.size + n_buckets * _BUCKET.size
+                    + capacity * slot_size)
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._init_arena(capacity, key_size, value_size, n_buckets)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+
+        self._buf = self._shm.buf
+        (self.capacity, self.key_size, self.value_size, self._n_buckets,
+         *_) = _HEADER.unpack_from(self._buf, 0)
+        self._slot_size = _SLOT.size + self.key_size + self.value_size
+        self._slots_offset = _HEADER.size + self._n_buckets * _BUCKET.size
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __reduce__(self):
+        return (self.__class__, (None, None, None, self.name, self._lock))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._header()[6]
+
+    def __contains__(self, key):
+        key = self._key_bytes(key)
+        with self._lock:
+            return self._find(key, zlib.crc32(key))[0] != _NIL
+
+    def _init_arena(self, capacity, key_size, value_size, n_buckets):
+        buf = self._shm.buf
+        _HEADER.pack_into(buf, 0, capacity, key_size, value_size, n_buckets,
+                          _NIL, _NIL, 0, 0)
+        for bucket in range(n_buckets):
+            _BUCKET.pack_into(buf, _HEADER.size + bucket * _BUCKET.size, _NIL)
+
+        # Chain all slots into the free list through their next pointers
+        slots_offset = _HEADER.size + n_buckets * _BUCKET.size
+        slot_size = _SLOT.size + key_size + value_size
+        for idx in range(capacity):
+            next_idx = idx + 1 if idx + 1 < capacity else _NIL
+            _SLOT.pack_into(buf, slots_offset + idx * slot_size,
+                            _NIL, next_idx, _NIL, 0, 0, 0)
+
+    def _key_bytes(self, key):
+        assert isinstance(key, (str, bytes, bytearray, memoryview)), \
+            'Key needs to be string or bytes-like object.'
+        key = key.encode() if isinstance(key, str) else bytes(key)
+        assert len(key) <= self.key_size, \
+            'Key needs to be at most {} bytes.'.format(self.key_size)
+        return key
+
+    # Header and slot accessors
+
+    def _header(self):
+        return list(_HEADER.unpack_from(self._buf, 0))
+
+    def _set_header(self, header):
+        _HEADER.pack_into(self._buf, 0, *header)
+
+    def _slot_offset(self, idx):
+        return self._slots_offset + idx * self._slot_size
+
+    def _slot(self, idx):
+        return list(_SLOT.unpack_from(self._buf, self._slot_offset(idx)))
+
+    def _set_slot(self, idx, slot):
+        _SLOT.pack_into(self._buf, self._slot_offset(idx), *slot)
+
+    def _bucket_offset(self, key_hash):
+        bucket = key_hash & (self._n_buckets - 1)
+        return _HEADER.size + bucket * _BUCKET.size
+
+    def _slot_key(self, idx, key_len):
+        offset = self._slot_offset(idx) + _SLOT.size
+        return self._buf[offset:offset + key_len]
+
+    def _slot_value(self, idx, value_len):
+        offset = self._slot_offset(idx) + _SLOT.size + self.key_size
+        return bytes(self._buf[offset:offset + value_len])
+
+    def _write_value(self, idx, slot, value):
+        offset = self._slot_offset(idx) + _SLOT.size + self.key_size
+        self._buf[offset:offset + len(value)] = value
+        slot[4] = len(value)
+
+    # Hash table and recency list operations
+
+    def _find(self, key, key_hash):
+        '''Returns slot index and slot of the key, (-1, None) if not found.'''
+        idx = _BUCKET.unpack_from(self._buf, self._bucket_offset(key_hash))[0]
+        while idx != _NIL:
+            slot = self._slot(idx)
+            if (slot[5] == key_hash) and (slot[3] == len(key)) \
+                    and (self._slot_key(idx, slot[3]) == key):
+                return idx, slot
+            idx = slot[2]
+        return _NIL, None
+
+    def _unchain(self, idx, slot):
+        '''Removes slot from its hash bucket chain.'''
+        bucket_offset = self._bucket_offset(slot[5])
+        prev_idx = _NIL
+        chain_idx = _BUCKET.unpack_from(self._buf, bucket_offset)[0]
+        while chain_idx != idx:
+            prev_idx = chain_idx
+            chain_idx = self._slot(chain_idx)[2]
+
+        if prev_idx == _NIL:
+            _BUCKET.pack_into(self._buf, bucket_offset, slot[2])
+        else:
+            prev_slot = self._slot(prev_idx)
+            prev_slot[2] = slot[2]
+            self._set_slot(prev_idx, prev_slot)
+
+    def _unlink(self, header, idx, slot):
+        '''Removes slot from recency list.'''
+        prev_idx, next_idx = slot[0], slot[1]
+        if prev_idx == _NIL:
+            header[4] = next_idx
+        else:
+            prev_slot = self._slot(prev_idx)
+            prev_slot[1] = next_idx
+            self._set_slot(prev_idx, prev_slot)
+
+        if next_idx == _NIL:
+            header[5] = prev_idx
+        else:
+            next_slot = self._slot(next_idx)
+            next_slot[0] = prev_idx
+            self._set_slot(next_idx, next_slot)
+
+    def _push_front(self, header, idx, slot):
+        '''Links slot as the most recently used. Slot is written by caller.'''
+        slot[0], slot[1] = _NIL, header[4]
+        if header[4] == _NIL:
+            header[5] = idx
+        else:
+            head_slot = self._slot(header[4])
+            head_slot[0] = idx
+            self._set_slot(header[4], head_slot)
+        header[4] = idx
+
+    def _evict(self, header):
+        '''Moves the least recently used slot to the free list.'''
+        idx = header[5]
+        slot = self._slot(idx)
+        self._unlink(header, idx, slot)
+        self._unchain(idx, slot)
+        slot[1] = header[7]
+        self._set_slot(idx, slot)
+        header[7] = idx
+        header[6] -= 1
+
+    def get(self, key):
+        '''Retrieve item from provided key and mark it as the most recently
+        used. Return None if nonexistent.
+        '''
+        key = self._key_bytes(key)
+        with self._lock:
+            idx, slot = self._find(key, zlib.crc32(key))
+            if idx == _NIL:
+                return None
+
+            header = self._header()
+            if header[4] != idx:
+                self._unlink(header, idx, slot)
+                self._push_front(header, idx, slot)
+                self._set_slot(idx, slot)
+                self._set_header(header)
+            return self._slot_value(idx, slot[4])
+
+    def set(self, key, value):
+        '''Set the bytes value of the key and mark it as the most recently
+        used. If the cache is at capacity remove the least recently used item.
+        '''
+        key = self._key_bytes(key)
+        assert isinstance(value, (bytes, bytearray, memoryview)), \
+            'Value needs to be bytes-like object.'
+        assert len(value) <= self.value_size, \
+            'Value needs to be at most {} bytes.'.format(self.value_size)
+
+        key_hash = zlib.crc32(key)
+        with self._lock:
+            header = self._header()
+            idx, slot = self._find(key, key_hash)
+
+            if idx != _NIL:
+                self._unlink(header, idx, slot)
+            else:
+                if header[7] == _NIL:
+                    self._evict(header)
+
+                # Take slot from free list and chain it into its bucket
+                idx = header[7]
+                header[7] = self._slot(idx)[1]
+                header[6] += 1
+
+                bucket_offset = self._bucket_offset(key_hash)
+                chain = _BUCKET.unpack_from(self._buf, bucket_offset)[0]
+                _BUCKET.pack_into(self._buf, bucket_offset, idx)
+                slot = [_NIL, _NIL, chain, len(key), 0, key_hash]
+                offset = self._slot_offset(idx) + _SLOT.size
+                self._buf[offset:offset + len(key)] = key
+
+            self._write_value(idx, slot, value)
+            self._push_front(header, idx, slot)
+            self._set_slot(idx, slot)
+            self._set_header(header)
+
+    def close(self):
+        '''Detaches this process from the shared memory.'''
+        self._buf = None
+        self._shm.close()
+
+    def unlink(self):
+        '''Destroys the shared memory block. Called once by the creator.'''
+        self._shm.unlink()
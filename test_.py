@@ -1,14 +1,46 @@
 '''Modul contains test methods for 7 data structure tasks'''
 
 import sys
+import gc
 import os
 import pytest
+import io
 import json
+import shutil
 import time
+import threading
+import asyncio
+import multiprocessing
+from pathlib import Path
+from collections import Counter
 
+from lru_cache import Cache
 from lru_cache import LRU_Cache
+from lru_cache import Concurrent_LRU_Cache
+from lru_cache import memoize
+from lru_cache import Async_Cache
+from cache_policies import make_cache
+from cache_policies import CountMinSketch
+from shared_cache import Shared_LRU_Cache
+from disk_cache import DiskStore
+from disk_cache import Tiered_LRU_Cache
 from find_files import FileManager
+from find_files import FileFilter
+from file_index import FileIndex
+from file_index import TrigramIndex
+import compression
 from compression import HuffmanCompressor
+from compression import HuffmanDecoder
+from compression import canonical_codes
+from compression import byte_counts
+from compression import compress_stream
+from compression import decompress_stream
+from compression import iter_compress
+from compression import iter_decompress
+from compression import compress_parallel
+from compression import decompress_parallel
+from compression import decompress_block
+from compression import read_index
 from blockchain import Block
 from blockchain import BlockChain
 from blockchain import calc_hash
@@ -19,7 +51,6 @@ class TestCache:
 
     def test_init_method(self, cache, standard_capacity):
         assert ((len(cache.memory) == 0)
-                and (len(cache._lru) == 0)
                 and (cache.capacity == standard_capacity))
 
     def test_init_method_valid_args(self, valid_capacity):
@@ -51,6 +82,453 @@ class TestCache:
         new_key, _, _, _, cache = full_capacity_cache
         assert not cache.get(new_key)
 
+    def test_get_method_refreshes_recency(self, full_capacity_cache):
+        new_key, new_value, rlu_key, rlu_value, cache = full_capacity_cache
+        cache.get(rlu_key)
+        cache.set(new_key, new_value)
+        assert ((cache.get(rlu_key) == rlu_value)
+                and (1 not in cache.memory)
+                and (len(cache.memory) == cache.capacity))
+
+    def test_set_method_hot_key_bounded(self, full_capacity_cache):
+        new_key, new_value, rlu_key, rlu_value, cache = full_capacity_cache
+        for _ in range(10 * cache.capacity):
+            cache.set(rlu_key, rlu_value)
+        cache.set(new_key, new_value)
+        assert ((list(cache.memory)[-2:] == [rlu_key, new_key])
+                and (cache.get(rlu_key) == rlu_value)
+                and (len(cache.memory) == cache.capacity))
+
+    def test_get_many_method(self, full_capacity_cache):
+        new_key, _, rlu_key, rlu_value, cache = full_capacity_cache
+        values = cache.get_many([rlu_key, new_key])
+        assert ((values == [rlu_value, None])
+                and (list(cache.memory)[-1] == rlu_key))
+
+    def test_set_many_method(self, full_capacity_cache, batch_pairs):
+        *_, cache = full_capacity_cache
+        loop_cache = LRU_Cache(cache.capacity)
+        loop_cache.set_many(cache.memory)
+        for key, value in batch_pairs:
+            loop_cache.set(key, value)
+
+        cache.set_many(batch_pairs)
+        assert list(cache.memory.items()) == list(loop_cache.memory.items())
+
+    def test_set_method_max_weight(self, full_capacity_cache):
+        new_key, _, rlu_key, _, cache = full_capacity_cache
+        cache = LRU_Cache(cache.capacity, max_weight=10, weigher=len)
+        cache.set_many([(rlu_key, 'a' * 4), (1, 'b' * 4)])
+        cache.set(new_key, 'c' * 4)
+        assert ((rlu_key not in cache) and (list(cache.memory) == [1, new_key])
+                and (cache.weight == 8) and (cache.evictions == 1))
+
+    def test_set_method_overweight_value(self, key):
+        cache = LRU_Cache(max_weight=10, weigher=len)
+        cache.set(key, 'a')
+        cache.set(key, 'a' * 11)
+        assert (key not in cache) and (cache.weight == 0)
+
+    def test_get_method_expired_key(self, key, clock):
+        cache = LRU_Cache(ttl=10, timer=clock.time)
+        cache.set(key, 'default ttl')
+        cache.set('short', 'short ttl', ttl=1)
+        clock.sleep(5)
+        assert ((cache.get('short') is None)
+                and (cache.get(key) == 'default ttl'))
+        clock.sleep(5)
+        assert (cache.get(key) is None) and (len(cache) == 0)
+
+    def test_set_method_sweeps_expired(self, clock):
+        cache = LRU_Cache(10, ttl=1, timer=clock.time)
+        cache.set_many((key, key) for key in range(cache.sweep_size))
+        clock.sleep(1)
+        cache.set('new', 'new')
+        assert list(cache.memory) == ['new']
+
+    def test_expire_method(self, clock):
+        cache = LRU_Cache(ttl=1, timer=clock.time)
+        for _ in range(10):
+            cache.set('hot', 'hot')
+        cache.set('other', 'other', ttl=5)
+        clock.sleep(1)
+        cache.expire()
+        assert ((list(cache.memory) == ['other'])
+                and (len(cache._expiry_heap) <= 2 + cache.sweep_size))
+
+
+class TestMemoize:
+
+    def test_cache_info_method(self, standard_capacity):
+        calls = []
+
+        @memoize(capacity=standard_capacity)
+        def square(x):
+            calls.append(x)
+            return x * x
+
+        results = [square(x) for x in [1, 2, 1] + list(range(10))]
+        info = square.cache_info()
+        assert ((results[:3] == [1, 4, 1])
+                and (calls == [1, 2, 0] + list(range(3, 10)))
+                and (info.hits == 3) and (info.misses == 10)
+                and (info.evictions == 10 - standard_capacity)
+                and (info.size == standard_capacity))
+
+    def test_memoize_none_result(self):
+        calls = []
+
+        @memoize()
+        def nothing(x):
+            calls.append(x)
+
+        nothing(1), nothing(1)
+        assert (calls == [1]) and (nothing.cache_info().hits == 1)
+
+    def test_memoize_custom_key(self):
+
+        @memoize(key=lambda items, scale=1: (tuple(items), scale))
+        def total(items, scale=1):
+            return sum(items) * scale
+
+        results = [total([1, 2]), total([1, 2]), total([1, 2], scale=2)]
+        info = total.cache_info()
+        assert ((results == [3, 3, 6])
+                and (info.hits == 1) and (info.misses == 2))
+
+    def test_cache_clear_method(self):
+
+        @memoize()
+        def identity(x):
+            return x
+
+        identity(1), identity(1)
+        identity.cache_clear()
+        assert identity.cache_info() == (0, 0, 0, 0, 128)
+
+    def test_memoize_invalid_key(self):
+        with pytest.raises(AssertionError):
+            memoize(key='not callable')
+
+
+class TestConcurrentCache:
+
+    def test_init_method_capacity_slices(self, valid_capacity, n_segments):
+        cache = Concurrent_LRU_Cache(valid_capacity, n_segments)
+        assert ((len(cache.segments) == n_segments)
+                and (sum(segment.capacity for segment in cache.segments)
+                     == valid_capacity))
+
+    def test_init_method_invalid_segments(self, valid_capacity):
+        with pytest.raises(AssertionError):
+            cache = Concurrent_LRU_Cache(valid_capacity, valid_capacity + 1)
+
+    def test_set_method_valid_key(self, key, value):
+        cache = Concurrent_LRU_Cache()
+        cache.set(key, value)
+        assert (key in cache) and (cache.get(key) == value)
+
+    def test_set_many_method(self, n_segments, batch_pairs):
+        cache = Concurrent_LRU_Cache(5, n_segments)
+        cache.set_many(dict(batch_pairs))
+        values = cache.get_many(key for key, _ in batch_pairs)
+        assert ((len(cache) <= cache.capacity)
+                and all(value in (None, batch_value) for value, (_, batch_value)
+                        in zip(values, batch_pairs)))
+
+    def test_clear_method(self, n_segments, batch_pairs):
+        cache = Concurrent_LRU_Cache(5, n_segments)
+        cache.set_many(batch_pairs)
+        cache.clear()
+        assert (isinstance(cache, Cache) and (len(cache) == 0)
+                and not any(key in cache for key, _ in batch_pairs))
+
+    def test_evictions_attribute(self, n_segments):
+        cache = Concurrent_LRU_Cache(5, n_segments)
+        cache.set_many((key, key) for key in range(20))
+        assert cache.evictions == 20 - len(cache) == 15
+
+    def test_set_method_threads(self, n_segments):
+        cache = Concurrent_LRU_Cache(5, n_segments)
+
+        def worker(offset):
+            for key in range(offset, 1000, 4):
+                cache.set(key, key)
+                cache.get(key - 1)
+
+        threads = [threading.Thread(target=worker, args=(offset,))
+                   for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert ((len(cache) <= cache.capacity)
+                and all(cache.get(key) == key
+                        for segment in cache.segments
+                        for key in list(segment.memory)))
+
+
+class TestAsyncCache:
+
+    def test_get_or_load_method_coalesces(self, key, value):
+        cache = Async_Cache()
+
+        async def loader(key):
+            await asyncio.sleep(0.01)
+            return value
+
+        async def main():
+            return await asyncio.gather(
+                *(cache.get_or_load(key, loader) for _ in range(10)))
+
+        results = asyncio.run(main())
+        assert ((results == [value] * 10) and (cache.loads == 1)
+                and (key in cache) and (not cache._loading))
+
+    def test_get_or_load_method_hit(self):
+        cache = Async_Cache()
+        cache.set('key', 'cached')
+
+        async def loader(key):
+            raise AssertionError('Loader called on hit.')
+
+        assert ((asyncio.run(cache.get_or_load('key', loader)) == 'cached')
+                and (cache.loads == 0))
+
+    def test_get_or_load_method_exception(self):
+        cache = Async_Cache()
+        calls = []
+
+        async def loader(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            if len(calls) == 1:
+                raise ValueError('Backing store failed.')
+            return 'loaded'
+
+        async def main():
+            first = await asyncio.gather(
+                *(cache.get_or_load('key', loader) for _ in range(5)),
+                return_exceptions=True)
+            second = await cache.get_or_load('key', loader)
+            return first, second
+
+        first, second = asyncio.run(main())
+        assert (all(isinstance(result, ValueError) for result in first)
+                and (second == 'loaded') and (calls == ['key', 'key']))
+
+    def test_get_or_load_method_cancelled_waiter(self):
+        cache = Async_Cache()
+
+        async def loader(key):
+            await asyncio.sleep(0.01)
+            return 'loaded'
+
+        async def main():
+            cancelled = asyncio.ensure_future(cache.get_or_load('key', loader))
+            waiter = asyncio.ensure_future(cache.get_or_load('key', loader))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            return await waiter
+
+        assert (asyncio.run(main()) == 'loaded') and (cache.loads == 1)
+
+    def test_get_or_load_method_cancelled_only_waiter(self):
+        cache = Async_Cache()
+
+        async def loader(key):
+            await asyncio.sleep(0.01)
+            raise ValueError('Backing store failed.')
+
+        async def main():
+            errors = []
+            asyncio.get_running_loop().set_exception_handler(
+                lambda loop, context: errors.append(context))
+            waiter = asyncio.ensure_future(cache.get_or_load('key', loader))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.sleep(0.05)
+            gc.collect()
+            return errors
+
+        assert (not asyncio.run(main())) and (not cache._loading)
+
+
+def set_shared_keys(cache, offset):
+    'Worker process setting keys of the shared cache.'
+    for key in range(offset, 100, 4):
+        cache.set(str(key), str(key).encode())
+    cache.close()
+
+
+class TestSharedCache:
+
+    def test_set_method_matches_lru_cache(self, shared_cache, cache):
+        for key in [0, 3, 1, 7, 3, 8, 9, 0, 2, 10]:
+            cache.get(key)
+            shared_cache.get(str(key))
+            cache.set(key, str(key).encode())
+            shared_cache.set(str(key), str(key).encode())
+
+        values = [shared_cache.get(str(key)) for key in list(cache.memory)]
+        assert ((values == list(cache.memory.values()))
+                and (len(shared_cache) == cache.capacity))
+
+    def test_set_method_invalid_value(self, shared_cache, invalid_bytes):
+        with pytest.raises(AssertionError):
+            shared_cache.set('key', invalid_bytes)
+
+    def test_set_method_invalid_key(self, shared_cache, invalid_shared_key):
+        with pytest.raises(AssertionError):
+            shared_cache.set(invalid_shared_key, b'value')
+
+    def test_attach_without_lock(self, shared_cache):
+        with pytest.raises(AssertionError):
+            Shared_LRU_Cache(name=shared_cache.name)
+
+    def test_set_method_processes(self):
+        shared_cache = Shared_LRU_Cache(100, 8, 8)
+        workers = [multiprocessing.Process(
+            target=set_shared_keys, args=(shared_cache, offset))
+            for offset in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        values = [shared_cache.get(str(key)) for key in range(100)]
+        size = len(shared_cache)
+        shared_cache.close()
+        shared_cache.unlink()
+        assert ((values == [str(key).encode() for key in range(100)])
+                and (size == 100))
+
+
+class TestTieredCache:
+
+    def test_set_method_spills_to_disk(self, tiered_cache):
+        tiered_cache.set_many((key, str(key)) for key in range(10))
+        assert ((list(tiered_cache.memory) == list(range(5, 10)))
+                and (len(tiered_cache.disk) == 5)
+                and all(key in tiered_cache for key in range(10)))
+
+    def test_get_method_promotes_from_disk(self, tiered_cache):
+        tiered_cache.set_many((key, str(key)) for key in range(10))
+        values = [tiered_cache.get(key) for key in [0, 0, 9, 10]]
+        assert ((values == ['0', '0', '9', None])
+                and (list(tiered_cache.memory)[-2:] == [0, 9])
+                and (0 not in tiered_cache.disk) and (5 in tiered_cache.disk)
+                and (tiered_cache.memory_hits == 2)
+                and (tiered_cache.disk_hits == 1)
+                and (tiered_cache.misses == 1))
+
+    def test_set_method_replaces_disk_value(self, tiered_cache):
+        tiered_cache.set_many((key, str(key)) for key in range(10))
+        tiered_cache.set(0, 'new')
+        assert (0 not in tiered_cache.disk) and (tiered_cache.get(0) == 'new')
+
+    def test_get_method_expired_on_disk(self, clock, tmp_path):
+        with Tiered_LRU_Cache(2, str(tmp_path / 'cache.log'), ttl=10,
+                              timer=clock.time) as cache:
+            cache.set_many([('a', 'a'), ('b', 'b')])
+            cache.set('c', 'c', ttl=1)
+            clock.sleep(5)
+            promoted = cache.get('a')
+            clock.sleep(5)
+            assert ((promoted == 'a') and (cache.get('a') is None)
+                    and (cache.get('c') is None) and (cache.disk_hits == 1))
+
+    def test_contains_method_expired_on_disk(self, clock, tmp_path):
+        with Tiered_LRU_Cache(1, str(tmp_path / 'cache.log'), ttl=1,
+                              timer=clock.time) as cache:
+            cache.set_many([('a', 'a'), ('b', 'b')])
+            clock.sleep(5)
+            assert ('a' not in cache) and (len(cache.disk) == 0)
+
+    def test_close_method_removes_temporary_log(self):
+        cache = Tiered_LRU_Cache(1)
+        cache.set_many([('a', 'a'), ('b', 'b')])
+        path = cache.disk.path
+        exists = os.path.exists(path)
+        cache.close()
+        assert exists and not os.path.exists(path)
+
+    def test_disk_store_compact_method(self, tmp_path):
+        path = str(tmp_path / 'store.log')
+        store = DiskStore(path)
+        for key in range(100):
+            store.put(key % 10, str(key))
+        store.discard(0)
+        store.compact()
+        live_bytes, garbage_bytes = store.live_bytes, store.garbage_bytes
+        size = os.path.getsize(path)
+        store.close()
+
+        store = DiskStore(path)
+        values = [store.pop(key) for key in range(1, 10)]
+        store.close()
+        assert ((values == [str(key) for key in range(91, 100)])
+                and (size == live_bytes) and (garbage_bytes == 0))
+
+    def test_disk_store_auto_compact(self, tmp_path):
+        store = DiskStore(str(tmp_path / 'store.log'), min_compact_bytes=0)
+        for key in range(100):
+            store.put('key', key)
+        assert ((store.garbage_bytes <= store.live_bytes)
+                and (store.pop('key') == 99))
+        store.close()
+
+
+class TestCachePolicies:
+
+    def test_set_method_valid_key(self, policy, key, value):
+        cache = make_cache(policy)
+        cache.set(key, value)
+        assert (key in cache) and (cache.get(key) == value)
+
+    def test_set_method_over_capacity(self, policy, standard_capacity):
+        cache = make_cache(policy, standard_capacity)
+        cache.set_many((key, key) for key in range(3 * standard_capacity))
+        assert ((len(cache) == standard_capacity)
+                and (cache.evictions == 2 * standard_capacity))
+
+    def test_clear_method(self, policy):
+        cache = make_cache(policy)
+        cache.set_many({'a': 1, 'b': 2})
+        cache.clear()
+        assert (len(cache) == 0) and (cache.get('a') is None)
+
+    def test_scan_resistance(self, scan_resistant_policy):
+        cache = make_cache(scan_resistant_policy, 100)
+        hot_keys = range(50)
+        cold_keys = iter(range(1000, 10000))
+        for _ in range(5):
+            for key in list(hot_keys) + [next(cold_keys) for _ in range(50)]:
+                if cache.get(key) is None:
+                    cache.set(key, key)
+
+        for key in range(10000, 11000):
+            if cache.get(key) is None:
+                cache.set(key, key)
+
+        assert sum(key in cache for key in hot_keys) >= 45
+
+    def test_make_cache_invalid_policy(self):
+        with pytest.raises(AssertionError):
+            make_cache('mru')
+
+    def test_count_min_sketch_aging(self):
+        sketch = CountMinSketch(16)
+        for _ in range(20):
+            sketch.increment('hot')
+        sketch.increment('cold')
+        frequent = sketch.estimate('hot')
+        for key in range(sketch.sample_size):
+            sketch.increment(key)
+        assert ((frequent == 15) and (sketch.estimate('cold') >= 1)
+                and (sketch.estimate('hot') < frequent))
+
 
 # Tests for task 2: Finding Files
 @pytest.mark.usefixtures('temp_directory')
@@ -82,6 +560,348 @@ class TestFileManager:
             searched_files = file_manager.find_files(
                 path=valid_path, **invalid_query)
 
+    def test_find_files_method_max_pending(
+        self, in_query, valid_path, right_files, max_pending):
+
+        class TrackingFileManager(FileManager):
+            lock = threading.Lock()
+            active = peak = 0
+
+            def _find_files(self, path, match, filters=None):
+                with self.lock:
+                    self.active += 1
+                    self.peak = max(self.peak, self.active)
+                time.sleep(0.001)
+                with self.lock:
+                    self.active -= 1
+                return super()._find_files(path, match, filters)
+
+        file_manager = TrackingFileManager()
+        searched_files = file_manager.find_files(
+            path=valid_path, max_pending=max_pending, **in_query)
+        assert ((set(searched_files) == right_files)
+                and (file_manager.peak <= max_pending))
+
+    def test_find_files_method_processes(
+        self, file_manager, in_query, valid_path, right_files, batch_size):
+
+        searched_files = file_manager.find_files(
+            path=valid_path, max_workers=2, processes=True,
+            batch_size=batch_size, **in_query)
+        assert sorted(searched_files) == sorted(right_files)
+
+    def test_find_files_method_filters(
+        self, file_manager, valid_path, filters):
+
+        file_filter, right_files = filters
+        searched_files = file_manager.find_files(
+            path=valid_path, query='', filters=file_filter)
+        assert sorted(searched_files) == sorted(right_files)
+
+    def test_find_files_method_filters_processes(
+        self, file_manager, valid_path):
+
+        searched_files = file_manager.find_files(
+            path=valid_path, query='', max_workers=2, processes=True,
+            filters=FileFilter(max_depth=2, extensions={'.c'}))
+        root = Path(valid_path).as_posix()
+        assert sorted(searched_files) == sorted(
+            root + '/testdir/' + path
+            for path in ('subdir1/a.c', 'subdir5/a.c', 't1.c'))
+
+    def test_find_files_method_pruned_not_scheduled(
+        self, file_manager, valid_path):
+
+        class TrackingFileManager(FileManager):
+            scanned = []
+
+            def _find_files(self, path, match, filters=None):
+                self.scanned.append(path)
+                return super()._find_files(path, match, filters)
+
+        TrackingFileManager().find_files(
+            valid_path, '', filters=FileFilter(exclude=['subdir3']))
+        assert ((len(TrackingFileManager.scanned) == 6)
+                and not any('subdir3' in path
+                            for path in TrackingFileManager.scanned))
+
+    def test_find_files_method_invalid_filters(
+        self, file_manager, valid_path):
+
+        with pytest.raises(AssertionError):
+            file_manager.find_files(valid_path, '', filters={'max_depth': 1})
+
+    def test_find_files_method_default_workers(
+        self, file_manager, in_query, valid_path, right_files):
+
+        searched_files = file_manager.find_files(
+            path=valid_path, max_workers=None, **in_query)
+        async_files = asyncio.run(file_manager.afind_files(
+            path=valid_path, max_workers=None, **in_query))
+        assert set(searched_files) == set(async_files) == right_files
+
+    def test_search_content_method_default_workers(
+        self, file_manager, content_tree):
+
+        lines = file_manager.search_content(
+            content_tree, '.c', 'TODO', max_workers=None)
+        assert sorted(lines) == sorted(
+            file_manager.search_content(content_tree, '.c', 'TODO'))
+
+    def test_search_content_method(self, file_manager, content_tree):
+        lines = file_manager.search_content(content_tree, '.c', 'TODO')
+        assert ((not isinstance(lines, list))
+                and (sorted(lines) == [
+                    (content_tree + '/notes.c', 1, 'TODO: caf\u00e9'),
+                    (content_tree + '/notes.c', 2, 'TODO TODO'),
+                    (content_tree + '/notes.c', 3, 'TODO'),
+                    (content_tree + '/src/main.c', 2, '  // TODO: parse args'),
+                    (content_tree + '/src/main.c', 5, '// TODO: free memory'),
+                ]))
+
+    def test_search_content_method_max_matches(
+        self, file_manager, content_tree):
+
+        lines = file_manager.search_content(
+            content_tree, r'.*\.(c|h|bin)$', rb'TODO: \w+', regex=True,
+            max_matches=1, max_workers=2, max_pending=1)
+        assert sorted(lines) == [
+            (content_tree + '/notes.c', 1, 'TODO: caf\u00e9'),
+            (content_tree + '/src/main.c', 2, '  // TODO: parse args'),
+            (content_tree + '/src/util.h', 1, '// TODO: header'),
+        ]
+
+    def test_search_content_method_shared_threads(self, content_tree):
+
+        class ThreadsFileManager(FileManager):
+            'FileManager recording threads walking and searching.'
+            threads = set()
+
+            def _find_files(self, path, match, filters=None):
+                self.threads.add(threading.get_ident())
+                return super()._find_files(path, match, filters)
+
+            def _search_file(self, path, pattern, max_matches):
+                self.threads.add(threading.get_ident())
+                return super()._search_file(path, pattern, max_matches)
+
+        file_manager = ThreadsFileManager()
+        lines = list(file_manager.search_content(
+            content_tree, '.c', 'TODO', max_workers=1))
+        assert (len(lines) == 5) and (len(file_manager.threads) == 1)
+
+    def test_search_content_method_invalid_pattern(
+        self, file_manager, content_tree):
+
+        with pytest.raises(AssertionError):
+            file_manager.search_content(content_tree, '.c', 1)
+
+    def test_iter_files_method_valid_path(
+        self, file_manager, in_query, valid_path, right_files):
+
+        searched_files = file_manager.iter_files(path=valid_path, **in_query)
+        assert ((not isinstance(searched_files, list))
+                and (set(searched_files) == right_files))
+
+    def test_iter_files_method_invalid_path(
+        self, file_manager, in_query, invalid_path):
+
+        with pytest.raises(AssertionError):
+            searched_files = file_manager.iter_files(
+                path=invalid_path, **in_query)
+
+    def test_iter_files_method_early_stop(self, in_query, valid_path):
+
+        class CountingFileManager(FileManager):
+            scanned = []
+
+            def _find_files(self, path, match, filters=None):
+                self.scanned.append(path)
+                return super()._find_files(path, match, filters)
+
+        file_manager = CountingFileManager()
+        searched_files = file_manager.iter_files(
+            path=valid_path, max_workers=1, max_pending=1, **in_query)
+        first_file = next(searched_files)
+        searched_files.close()
+        time.sleep(0.01)
+        assert ((first_file.endswith('t1.c'))
+                and (len(file_manager.scanned) <= 2))
+
+    def test_afind_files_method_valid_path(
+        self, file_manager, in_query, valid_path, right_files):
+
+        searched_files = asyncio.run(
+            file_manager.afind_files(path=valid_path, **in_query))
+        assert set(searched_files) == right_files
+
+    def test_aiter_files_method_invalid_path(
+        self, file_manager, in_query, invalid_path):
+
+        with pytest.raises(AssertionError):
+            searched_files = file_manager.aiter_files(
+                path=invalid_path, **in_query)
+
+    def test_aiter_files_method_early_stop(
+        self, file_manager, in_query, valid_path):
+
+        async def first_file():
+            searched_files = file_manager.aiter_files(
+                path=valid_path, max_workers=1, max_pending=1, **in_query)
+            async for file_path in searched_files:
+                await searched_files.aclose()
+                return file_path
+
+        assert asyncio.run(first_file()).endswith('t1.c')
+
+    def test_find_files_method_thread_exception(self, in_query, valid_path):
+
+        class FailingFileManager(FileManager):
+            def _find_files(self, path, match, filters=None):
+                if path.endswith('subdir3'):
+                    raise PermissionError(path)
+                return super()._find_files(path, match, filters)
+
+        with pytest.raises(PermissionError):
+            FailingFileManager().find_files(path=valid_path, **in_query)
+
+
+class TestFileIndex:
+
+    def test_index_files_method_valid_path(
+        self, file_manager, in_query, index_tree, right_files):
+
+        root, index_path = index_tree
+        index = file_manager.index_files(root, index_path)
+        assert ((set(index.find_files(**in_query)) == right_files)
+                and (set(index) == set(file_manager.find_files(root, '')))
+                and os.path.exists(index_path))
+
+    def test_index_files_method_invalid_path(
+        self, file_manager, invalid_path):
+
+        with pytest.raises(AssertionError):
+            index = file_manager.index_files(invalid_path)
+
+    def test_index_files_method_refresh(
+        self, file_manager, index_tree, monkeypatch):
+
+        monkeypatch.setattr(FileIndex, 'mtime_guard_ns', 0)
+        root, index_path = index_tree
+        file_manager.index_files(root, index_path)
+
+        os.mkdir(os.path.join(root, 'testdir', 'subdir6'))
+        open(os.path.join(root, 'testdir', 'subdir6', 'c.c'), 'w').close()
+        os.remove(os.path.join(root, 'testdir', 't1.c'))
+        shutil.rmtree(os.path.join(root, 'testdir', 'subdir3'))
+        mtime = time.time_ns() + 10 ** 9
+        os.utime(os.path.join(root, 'testdir'), ns=(mtime, mtime))
+
+        index = FileIndex.load(index_path)
+        rescanned = index.refresh()
+        assert ((rescanned == 2)
+                and (set(index) == set(file_manager.find_files(root, '')))
+                and (index.find_files('c.c') == [
+                    root + '/testdir/subdir6/c.c']))
+
+    def test_index_files_method_unchanged(
+        self, file_manager, index_tree, monkeypatch):
+
+        monkeypatch.setattr(FileIndex, 'mtime_guard_ns', 0)
+        root, index_path = index_tree
+        file_manager.index_files(root, index_path)
+        index = FileIndex.load(index_path)
+        assert index.refresh() == 0
+
+    def test_index_files_method_other_root(
+        self, file_manager, index_tree):
+
+        root, index_path = index_tree
+        file_manager.index_files(root + '/testdir/subdir1', index_path)
+        index = file_manager.index_files(root, index_path)
+        assert (index.root == root) and (len(index) == 10)
+
+    def test_trigram_index_matches_scan(
+        self, file_manager, index_tree, trigram_query):
+
+        root, _ = index_tree
+        index = file_manager.index_files(root)
+        paths = sorted(index)
+        expected = set(file_manager.find_files(root, **trigram_query))
+        assert (set(TrigramIndex(paths).find_files(**trigram_query))
+                == set(index.find_files(**trigram_query)) == expected)
+
+    def test_trigram_index_candidates(self):
+        index = TrigramIndex(
+            ['a/abcd.c', 'b/bcd.h', 'c/xyz.c', 'd/xyz.h', 'e/xyz.d'])
+        assert ((index.candidates('bcd') == [0, 1])
+                and (index.candidates('abcd') == [0])
+                and (index.candidates('qqq') == [])
+                and (index.candidates('.c') is None)
+                and (index.candidates('/xyz.') is None))
+
+    def test_trigram_index_rebuilt_on_refresh(
+        self, file_manager, index_tree, monkeypatch):
+
+        monkeypatch.setattr(FileIndex, 'mtime_guard_ns', 0)
+        root, _ = index_tree
+        index = file_manager.index_files(root)
+        assert index.find_files('new.c') == []
+
+        open(os.path.join(root, 'testdir', 'new.c'), 'w').close()
+        mtime = time.time_ns() + 10 ** 9
+        os.utime(os.path.join(root, 'testdir'), ns=(mtime, mtime))
+        index.refresh()
+        assert index.find_files('new.c') == [root + '/testdir/new.c']
+
+
+class TestFileWatcher:
+
+    @staticmethod
+    def wait_events(watcher, n_events, timeout=5):
+        events = []
+        deadline = time.monotonic() + timeout
+        while (len(events) < n_events) and (time.monotonic() < deadline):
+            events.extend(watcher.poll(0.1))
+        return sorted(events)
+
+    def test_watch_files_method_initial_files(self, watch_tree):
+        root, watcher = watch_tree
+        assert watcher.files == {root + '/src/main.c'}
+
+    def test_watch_files_method_added(self, watch_tree):
+        root, watcher = watch_tree
+        os.makedirs(os.path.join(root, 'lib', 'sub'))
+        open(os.path.join(root, 'lib', 'sub', 'util.c'), 'w').close()
+        open(os.path.join(root, 'lib', 'util.h'), 'w').close()
+        open(os.path.join(root, 'src', 'parse.c'), 'w').close()
+        assert self.wait_events(watcher, 2) == [
+            ('added', root + '/lib/sub/util.c'),
+            ('added', root + '/src/parse.c')]
+
+    def test_watch_files_method_removed(self, watch_tree):
+        root, watcher = watch_tree
+        os.remove(os.path.join(root, 'src', 'main.c'))
+        assert ((self.wait_events(watcher, 1)
+                 == [('removed', root + '/src/main.c')])
+                and (watcher.files == set()))
+
+    def test_watch_files_method_moved_directory(self, watch_tree):
+        root, watcher = watch_tree
+        os.rename(os.path.join(root, 'src'), os.path.join(root, 'lib'))
+        assert ((self.wait_events(watcher, 2) == [
+                    ('added', root + '/lib/main.c'),
+                    ('removed', root + '/src/main.c')])
+                and (watcher.files == {root + '/lib/main.c'}))
+
+    def test_watch_files_method_no_changes(self, watch_tree):
+        _, watcher = watch_tree
+        assert watcher.poll(0.05) == []
+
+    def test_watch_files_method_invalid_path(self, invalid_path):
+        with pytest.raises(AssertionError):
+            FileManager().watch_files(invalid_path, '.c')
+
 
 # Tests for task 3: Huffman Coding
 class TestHuffmanCompressor:
@@ -135,6 +955,224 @@ class TestHuffmanCompressor:
             with pytest.raises(NotImplementedError):
                 decoded_str = hc.decode(invalid_encoded_str, sum_check_error)
 
+    def test_decode_bytes_method(self, valid_hf_set):
+        valid_str, _, _, encoded_str = valid_hf_set
+        hc = HuffmanCompressor(valid_str)
+        n_bits = len(encoded_str)
+        packed = int(encoded_str + '0' * (-n_bits % 8), 2).to_bytes(
+            (n_bits + 7) // 8, 'big')
+        assert hc.decode_bytes(packed, n_bits) == valid_str
+
+    def test_decode_bytes_method_invalid_n_bits(self, valid_hf_set):
+        valid_str, *_ = valid_hf_set
+        hc = HuffmanCompressor(valid_str)
+        with pytest.raises(AssertionError):
+            hc.decode_bytes(b'\x00', 9)
+
+    def test_encode_bytes_method(self, valid_hf_set):
+        valid_str, _, encode_map, _ = valid_hf_set
+        hc = HuffmanCompressor(valid_str)
+        codes = canonical_codes(hc.code_lengths())
+        encoded_str = ''.join(codes[char] for char in valid_str)
+        container = hc.encode_bytes()
+        payload = container[-((len(encoded_str) + 7) // 8):]
+        hc.pack_chunk_size = 3
+        assert ((container[:4] == b'HUF1')
+                and (hc.encode_bytes() == container)
+                and (bin(int.from_bytes(b'\x01' + payload, 'big'))[3:]
+                     .startswith(encoded_str))
+                and (hc.decode(container) == valid_str))
+
+    def test_encode_bytes_method_header_size(self, valid_hf_set):
+        valid_str, _, encode_map, _ = valid_hf_set
+        container = HuffmanCompressor(valid_str).encode_bytes()
+        n_payload = -(-sum(len(encode_map[char]) for char in valid_str) // 8)
+        assert len(container) == (22 + n_payload + sum(
+            2 + len(char.encode()) for char in encode_map))
+
+    def test_canonical_codes(self, valid_hf_set):
+        _, _, encode_map, _ = valid_hf_set
+        lengths = {char: len(code) for char, code in encode_map.items()}
+        codes = canonical_codes(lengths)
+        ordered = sorted(codes, key=lambda char: (lengths[char], char))
+        assert (({char: len(code) for char, code in codes.items()} == lengths)
+                and (set(codes[ordered[0]]) == {'0'})
+                and ([codes[char] for char in ordered] == sorted(
+                    codes.values(), key=lambda code: (len(code), code)))
+                and HuffmanDecoder(codes).symbols)
+
+    def test_canonical_codes_invalid_lengths(self):
+        with pytest.raises(AssertionError):
+            canonical_codes({'a': 1, 'b': 1, 'c': 1})
+
+    def test_decode_method_container_other_instance(self, long_str):
+        container = HuffmanCompressor(long_str).encode_bytes()
+        assert HuffmanCompressor('other').decode(container) == long_str
+
+    def test_decode_method_container_checksum(self, valid_hf_set):
+        valid_str, *_ = valid_hf_set
+        hc = HuffmanCompressor(valid_str)
+        container = bytearray(hc.encode_bytes())
+        container[-1] ^= 0xFF
+        with pytest.raises(AssertionError):
+            hc.decode(container)
+
+    def test_decode_method_container_table_symbol(self):
+        hc = HuffmanCompressor('hello world')
+        container = bytearray(hc.encode_bytes())
+        container[container.index(b'h', compression._HEADER.size)] = ord('j')
+        with pytest.raises(AssertionError):
+            hc.decode(container)
+
+    def test_decode_method_container_flags(self, byte_str):
+        hc = HuffmanCompressor(byte_str)
+        container = bytearray(hc.encode_bytes())
+        container[5] ^= compression._BYTES_FLAG
+        with pytest.raises(AssertionError):
+            hc.decode(container)
+
+    def test_decode_method_container_truncated(self, long_str):
+        hc = HuffmanCompressor(long_str)
+        container = hc.encode_bytes()
+        for size in (10, compression._HEADER.size + 3, len(container) - 1):
+            with pytest.raises(AssertionError):
+                hc.decode(container[:size])
+
+    def test_decode_method_container_invalid_table(self):
+        # corrupted symbol with matching checksum still fails the assertion
+        hc = HuffmanCompressor('hello world')
+        container = bytearray(hc.encode_bytes())
+        container[container.index(b'h', compression._HEADER.size)] = 0xFF
+        compression._CRC.pack_into(container, compression._CRC_OFFSET,
+                                   compression._container_crc(container))
+        with pytest.raises(AssertionError):
+            hc.decode(container)
+
+    def test_from_codes_method_invalid_codes(self):
+        with pytest.raises(AssertionError):
+            HuffmanCompressor.from_codes({'a': '0', 'b': '01'})
+
+    def test_decode_method_long_string(self, long_str):
+        hc = HuffmanCompressor(long_str)
+        assert hc.decode(hc.encode()) == long_str
+
+    def test_decode_method_large_alphabet(
+        self, large_alphabet_str, monkeypatch):
+
+        monkeypatch.setattr(HuffmanDecoder, 'max_rows', 8)
+        hc = HuffmanCompressor(large_alphabet_str)
+        assert ((hc.decode(hc.encode()) == large_alphabet_str)
+                and (len(hc._decoder.table) == 8 * 256))
+
+    def test_decode_method_invalid_without_rows(self, monkeypatch):
+        monkeypatch.setattr(HuffmanDecoder, 'max_rows', 0)
+        decoder = HuffmanDecoder({'a': '0', 'b': '10'})
+        with pytest.raises(AssertionError):
+            decoder.decode(b'\x0f', 8)
+
+    def test_bytes_round_trip(self, byte_str):
+        hc = HuffmanCompressor(memoryview(bytearray(byte_str)))
+        assert ((hc.string == byte_str)
+                and (hc.decode(hc.encode()) == byte_str)
+                and (hc.decode(hc.encode_bytes()) == byte_str))
+
+    def test_bytes_same_codes_as_latin1_string(self, byte_str):
+        assert (HuffmanCompressor(byte_str).encode()
+                == HuffmanCompressor(byte_str.decode('latin-1')).encode())
+
+    def test_bytes_container_other_instance(self, byte_str):
+        container = HuffmanCompressor(byte_str).encode_bytes()
+        assert ((container[5] == 1)
+                and (HuffmanCompressor('other').decode(container)
+                     == byte_str))
+
+    def test_byte_counts(self, byte_str, monkeypatch):
+        expected = {chr(byte): count
+                    for byte, count in Counter(byte_str).items()}
+        counts = byte_counts(byte_str)
+        monkeypatch.setattr(compression, 'numpy', None)
+        assert counts == byte_counts(memoryview(byte_str)) == expected
+        assert list(counts) == list(byte_counts(byte_str)) == \
+            sorted(expected)
+
+    def test_tree_independent_of_count_order(self, byte_str, monkeypatch):
+        expected = HuffmanCompressor(byte_str)._encode_map
+        counts = byte_counts(byte_str)
+        monkeypatch.setattr(
+            compression, 'byte_counts',
+            lambda data: dict(reversed(list(counts.items()))))
+        assert HuffmanCompressor(byte_str)._encode_map == expected
+
+
+class TestHuffmanStream:
+
+    def test_compress_stream_round_trip(self, stream_bytes, block_size):
+        compressed, decompressed = io.BytesIO(), io.BytesIO()
+        written = compress_stream(io.BytesIO(stream_bytes), compressed,
+                                  block_size)
+        compressed.seek(0)
+        decompress_stream(compressed, decompressed)
+        assert ((written == len(compressed.getvalue()))
+                and (decompressed.getvalue() == stream_bytes))
+
+    def test_iter_compress_chunks(self, stream_bytes, block_size):
+        chunks = [stream_bytes[idx:idx + 7]
+                  for idx in range(0, len(stream_bytes), 7)]
+        frames = list(iter_compress(chunks, block_size))
+        n_blocks = -(-len(stream_bytes) // block_size)
+        assert ((len(frames) == 2 * n_blocks + 3)
+                and (b''.join(iter_decompress(frames)) == stream_bytes))
+
+    def test_iter_decompress_truncated(self, stream_bytes, block_size):
+        compressed = b''.join(iter_compress([stream_bytes], block_size))
+        n_blocks = len(read_index(compressed))
+        # Cut the stream inside the end frame before the block index
+        with pytest.raises(AssertionError):
+            list(iter_decompress([compressed[:-16 * (n_blocks + 1) - 1]]))
+
+    def test_compress_parallel_same_stream(self, stream_bytes, block_size):
+        compressed = io.BytesIO()
+        written = compress_parallel(io.BytesIO(stream_bytes), compressed,
+                                    block_size, max_workers=2, max_pending=3)
+        assert ((compressed.getvalue() == b''.join(
+                    iter_compress([stream_bytes], block_size)))
+                and (written == len(compressed.getvalue())))
+
+    def test_decompress_parallel(self, stream_bytes, block_size):
+        compressed = b''.join(iter_compress([stream_bytes], block_size))
+        decompressed = io.BytesIO()
+        written = decompress_parallel(compressed, decompressed, max_workers=2)
+        assert ((decompressed.getvalue() == stream_bytes)
+                and (written == len(stream_bytes)))
+
+    def test_decompress_block(self, stream_bytes, block_size):
+        archive = io.BytesIO(b''.join(iter_compress([stream_bytes],
+                                                    block_size)))
+        index = read_index(archive)
+        blocks = [decompress_block(archive, block_idx, index)
+                  for block_idx in reversed(range(len(index)))]
+        assert ((b''.join(reversed(blocks)) == stream_bytes)
+                and all(block_len == len(block) for (*_, block_len), block
+                        in zip(reversed(index), blocks)))
+
+    def test_read_index_invalid_stream(self):
+        with pytest.raises(AssertionError):
+            read_index(b'HUFS' + bytes(32))
+
+    def test_iter_compress_invalid_block_size(self, invalid_block_size):
+        with pytest.raises(AssertionError):
+            iter_compress([b'data'], invalid_block_size)
+
+    def test_compress_stream_invalid_block_size(self, invalid_block_size):
+        destination = io.BytesIO()
+        with pytest.raises(AssertionError):
+            compress_stream([b'data'], destination, invalid_block_size)
+        assert not destination.getvalue()
+
+    def test_compress_parallel_invalid_block_size(self, invalid_block_size):
+        with pytest.raises(AssertionError):
+            compress_parallel([b'data'], io.BytesIO(), invalid_block_size)
+
 
 # Tests for task 4: Active Directory
 class TestGroup: